@@ -11,6 +11,10 @@ DISCORD_TOKEN=xxxxxxxxxxxxxxxxxxxxxxxx
 # FFMPEG_PATH=C:\ffmpeg\bin\ffmpeg.exe  (si ffmpeg n'est pas dans le PATH)
 # LOG_LEVEL=INFO
 # LOG_FILE=logs/bot.log
+# LOG_FORMAT=text                       (ou json : une ligne JSON par événement)
+# LOG_COMPRESSION=gzip                  (gzip | zstd [pip install zstandard] | none)
+# LOG_RETENTION_DAYS=30
+# LOG_RETENTION_MAX_BYTES=209715200     (taille max des archives)
 # LOG_CHANNEL_ID=123456789012345678     (si tu veux envoyer des logs dans un salon)
 # LIVE_CHANNEL_ID=123456789012345678    (pour renommer un salon en Live ON/OFF)
 # LIVE_NAME_ON=🟢・Live ON
@@ -23,10 +27,19 @@ from __future__ import annotations
 import os
 import re
 import sys
+import gzip
+import json
+import mmap
+import functools
+import time
+import queue
+import signal
+import threading
 import shutil
 import asyncio
 import logging
 import textwrap
+from datetime import datetime, timezone
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 from typing import Optional, List
@@ -42,29 +55,375 @@ try:
 except Exception:
     yt_dlp = None
 
+# ---- zstd pour les logs archivés (optionnel)
+try:
+    import zstandard  # type: ignore
+except Exception:
+    zstandard = None
+
 # ---- TikTok (optionnel)
 try:
     from TikTokLive import TikTokLiveClient  # type: ignore
 except Exception:
     TikTokLiveClient = None
 
+PROCESS_START = time.monotonic()  # pour mesurer le délai "démarrage → musique relancée"
+
 # ---------- .env ----------
 ENV_PATH = Path(__file__).with_name(".env")
 load_dotenv(dotenv_path=ENV_PATH, override=True)
 
 # ================== LOGGING (console + fichier + filtre httpx) ==================
+LOG_FIELDS = ("guild", "user", "command", "event", "duration_ms")  # champs stables du mode JSON
+
+class JsonLineFormatter(logging.Formatter):
+    """Une ligne JSON par record ; les champs contextuels viennent de `extra=` (null si absents)."""
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        for key in LOG_FIELDS:
+            data[key] = getattr(record, key, None)
+        data["msg"] = record.getMessage()
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+# ---- index des segments archivés (pour /logs)
+LOG_INDEX_BLOCK = 64 * 1024   # taille (non compressée) d'un bloc indexé
+LOG_INDEX_VERSION = 2         # v2 : postings par guilde
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+_TEXT_LINE_RE = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) \| (\w+) \| ([^|]+?) \| ([^|]*) \| (.*)$")
+_TEXT_GUILD_RE = re.compile(r" g=(\d+)")
+_TEXT_USER_RE = re.compile(r"\((\d{15,21})\)")
+_TEXT_CMD_RE = re.compile(r"^\S+ /(\w+) ")
+
+@functools.lru_cache(maxsize=4096)
+def _local_ts(stamp: str) -> float:
+    return time.mktime(time.strptime(stamp, "%Y-%m-%d %H:%M:%S"))
+
+def parse_log_line(line: str) -> dict | None:
+    """Record (ts, level, logger, guild, user, command, msg) depuis une ligne texte ou JSON ; None si continuation."""
+    if line.startswith("{"):
+        try:
+            data = json.loads(line)
+            ts = datetime.fromisoformat(data["ts"]).timestamp()
+        except (ValueError, KeyError, TypeError):
+            return None
+        user, guild = data.get("user"), data.get("guild")
+        return {"ts": ts, "level": data.get("level"), "logger": data.get("logger"),
+                "guild": str(guild) if guild is not None else None,
+                "user": str(user) if user is not None else None, "command": data.get("command"),
+                "msg": data.get("msg") or ""}
+    m = _TEXT_LINE_RE.match(line)
+    if not m:
+        return None
+    stamp, level, logger_name, where, msg = m.groups()
+    try:
+        ts = _local_ts(stamp)
+    except ValueError:
+        return None
+    gm = _TEXT_GUILD_RE.search(where)
+    um = _TEXT_USER_RE.search(msg)
+    cm = _TEXT_CMD_RE.match(msg)
+    return {"ts": ts, "level": level, "logger": logger_name, "guild": gm.group(1) if gm else None,
+            "user": um.group(1) if um else None,
+            "command": cm.group(1) if cm else None, "msg": msg}
+
+def iter_log_records(text: str, prefilter: list[re.Pattern] | None = None):
+    """(record, lignes brutes) ; les lignes de continuation (tracebacks) restent attachées au record.
+
+    `prefilter` : la ligne de tête doit matcher chaque motif, sinon le record est sauté sans être parsé.
+    """
+    rec, raw = None, []
+    for line in text.splitlines():
+        if prefilter and (line[:1] == "{" or line[:4].isdigit()) \
+                and not all(rx.search(line) for rx in prefilter):
+            if rec is not None:
+                yield rec, "\n".join(raw)
+            rec, raw = None, []
+            continue
+        parsed = parse_log_line(line)
+        if parsed is None:
+            if rec is not None:
+                raw.append(line)
+            continue
+        if rec is not None:
+            yield rec, "\n".join(raw)
+        rec, raw = parsed, [line]
+    if rec is not None:
+        yield rec, "\n".join(raw)
+
+class LogIndex:
+    """Index sidecar d'un segment : blocs décompressables indépendamment + postings par clé.
+
+    blocks[i] = (offset, longueur) dans le fichier archivé, ts min, ts max.
+    postings[key][valeur] = numéros de blocs contenant au moins un record correspondant.
+    """
+    KEYS = ("level", "logger", "guild", "user", "command")
+
+    def __init__(self, compression: str):
+        self.compression = compression
+        self.blocks: list[tuple[int, int, float, float]] = []
+        self.postings: dict[str, dict[str, list[int]]] = {k: {} for k in self.KEYS}
+
+    @property
+    def t_min(self) -> float | None:
+        return min((b[2] for b in self.blocks), default=None)
+
+    @property
+    def t_max(self) -> float | None:
+        return max((b[3] for b in self.blocks), default=None)
+
+    def add_block(self, offset: int, length: int, text: str):
+        n = len(self.blocks)
+        t_lo, t_hi = float("inf"), float("-inf")
+        for rec, _ in iter_log_records(text):
+            t_lo, t_hi = min(t_lo, rec["ts"]), max(t_hi, rec["ts"])
+            for key in self.KEYS:
+                val = rec.get(key)
+                if val is not None:
+                    ids = self.postings[key].setdefault(str(val), [])
+                    if not ids or ids[-1] != n:
+                        ids.append(n)
+        if t_lo > t_hi:
+            return  # bloc sans record daté : on ne l'indexe pas
+        self.blocks.append((offset, length, t_lo, t_hi))
+
+    def candidates(self, since: float | None, until: float | None, **filters: set[str] | None) -> list[int]:
+        """Blocs pouvant contenir un résultat (intersection des postings + recouvrement temporel)."""
+        ids = set(range(len(self.blocks)))
+        for key, wanted in filters.items():
+            if wanted is None:
+                continue
+            hit: set[int] = set()
+            for val in wanted:
+                hit.update(self.postings.get(key, {}).get(val, ()))
+            ids &= hit
+        return sorted(i for i in ids
+                      if (since is None or self.blocks[i][3] >= since) and (until is None or self.blocks[i][2] <= until))
+
+    def save(self, path: str):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"v": LOG_INDEX_VERSION, "compression": self.compression, "blocks": self.blocks, "postings": self.postings}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "LogIndex":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        idx = cls(data["compression"])
+        idx.blocks = [tuple(b) for b in data["blocks"]]
+        idx.postings = data["postings"]
+        return idx
+
+def _index_version(path: str | Path) -> int:
+    """Version d'un sidecar (0 si absent) ; lit juste l'en-tête, "v" étant écrit en premier."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            m = re.match(r'\{"v": (\d+)', f.read(16))
+    except OSError:
+        return 0
+    return int(m.group(1)) if m else 0
+
+def _compress_block(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)  # frame autonome (taille incluse)
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=6)               # membre gzip autonome
+    return data
+
+def _decompress_block(data: bytes, compression: str) -> bytes:
+    if compression == "zstd":
+        # decompressobj : accepte aussi les frames sans taille de contenu (archives copy_stream d'avant l'index)
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    if compression == "gzip":
+        return gzip.decompress(data)
+    return data
+
+def _read_blocks(src, size: int):
+    """Découpe un fichier en blocs de ~`size` octets terminés sur une fin de ligne."""
+    while True:
+        block = src.read(size)
+        if not block:
+            return
+        if not block.endswith(b"\n"):
+            block += src.readline()
+        yield block
+
+def log_segments(log_file: str | Path) -> list[Path]:
+    """Segments archivés (hors sidecars), du plus ancien au plus récent."""
+    base = Path(log_file)
+    segs = []
+    for p in base.parent.glob(base.name + ".*"):
+        if p.name.endswith((".idx", ".tmp")):
+            continue
+        try:
+            segs.append((p.stat().st_mtime, p.name, p))
+        except OSError:
+            pass  # purgé entre-temps
+    return [p for _, _, p in sorted(segs)]
+
+class ArchivingFileHandler(RotatingFileHandler):
+    """Rotation par taille ; les segments sont compressés, indexés et purgés par un thread de fond.
+
+    Chaque archive est une suite de blocs compressés indépendamment (membres gzip / frames zstd),
+    décrits par un sidecar `<archive>.idx` (voir LogIndex). La rétention dépend de l'âge (`retention_days`) et de la taille totale des archives
+    (`retention_bytes`) au lieu d'un nombre fixe de backups. La rotation ne fait qu'un rename.
+    """
+    def __init__(self, filename: str, max_bytes: int, compression: str = "gzip",
+                 retention_days: float = 30, retention_bytes: int = 0):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=0, encoding="utf-8")
+        if compression == "zstd" and zstandard is None:
+            compression = "gzip"
+        self.compression = compression
+        self.retention_days = retention_days
+        self.retention_bytes = retention_bytes
+        self._jobs: queue.Queue[str | None] = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="log-archiver", daemon=True)
+        self._worker.start()
+        # segments laissés non compressés / non indexés / indexés dans un ancien format
+        for seg in self.segments():
+            compressed = seg.name.endswith((".gz", ".zst"))
+            if not compressed and self.suffix or _index_version(f"{seg}.idx") < LOG_INDEX_VERSION:
+                self._jobs.put(str(seg))
+        self._jobs.put("")  # "" = purge seule
+
+    @property
+    def suffix(self) -> str:
+        return {"gzip": ".gz", "zstd": ".zst"}.get(self.compression, "")
+
+    def segments(self) -> list[Path]:
+        return log_segments(self.baseFilename)
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        dest = f"{self.baseFilename}.{stamp}"
+        n = 0
+        while any(os.path.exists(dest + ext) for ext in ("", ".gz", ".zst")):
+            n += 1
+            dest = f"{self.baseFilename}.{stamp}-{n}"
+        if os.path.exists(self.baseFilename):
+            os.replace(self.baseFilename, dest)
+            self._jobs.put(dest)
+        if not self.delay:
+            self.stream = self._open()
+
+    def close(self):
+        self._jobs.put(None)
+        super().close()
+
+    # --- thread de fond
+    def _run(self):
+        while True:
+            path = self._jobs.get()
+            if path is None:
+                return
+            try:
+                if path:
+                    self._archive(path)
+                self._prune()
+            except Exception as e:
+                sys.stderr.write(f"[log-archiver] {path}: {e}\n")
+
+    def _archive(self, path: str):
+        if path.endswith((".gz", ".zst")):
+            # archive déjà compressée : on réindexe en gardant ses blocs (un seul bloc si pas de sidecar)
+            compression = "zstd" if path.endswith(".zst") else "gzip"
+            if compression == "zstd" and zstandard is None:
+                return
+            with open(path, "rb") as f:
+                raw = f.read()
+            side = path + ".idx"
+            spans = [(b[0], b[1]) for b in LogIndex.load(side).blocks] if os.path.exists(side) else [(0, len(raw))]
+            index = LogIndex(compression)
+            for off, length in spans:
+                chunk = _decompress_block(raw[off:off + length], compression)
+                index.add_block(off, length, chunk.decode("utf-8", "replace"))
+            index.save(side)
+            return
+        dest = path + self.suffix
+        index = LogIndex(self.compression)
+        offset = 0
+        with open(path, "rb") as src:
+            dst = open(dest + ".tmp", "wb") if self.suffix else None
+            try:
+                for block in _read_blocks(src, LOG_INDEX_BLOCK):
+                    data = _compress_block(block, self.compression)
+                    if dst:
+                        dst.write(data)
+                    index.add_block(offset, len(data), block.decode("utf-8", "replace"))
+                    offset += len(data)
+            finally:
+                if dst:
+                    dst.close()
+        if self.suffix:
+            os.replace(dest + ".tmp", dest)
+            os.remove(path)
+        index.save(dest + ".idx")
+
+    def _finished(self, seg: Path) -> bool:
+        """Archive terminée, quel que soit le mode qui l'a produite (.gz, .zst ou segment brut indexé)."""
+        if seg.name.endswith((".gz", ".zst")):
+            return True
+        return not self.suffix and os.path.exists(f"{seg}.idx")  # sinon : en attente de compression/index
+
+    def _prune(self):
+        # toutes les archives finies comptent (un changement de LOG_COMPRESSION ne les rend pas éternelles) ;
+        # un segment en attente de compression n'est jamais purgé
+        segs = [p for p in self.segments() if self._finished(p)]
+        if self.retention_days > 0:
+            cutoff = time.time() - self.retention_days * 86400
+            for p in [p for p in segs if p.stat().st_mtime < cutoff]:
+                p.unlink(missing_ok=True)
+                Path(f"{p}.idx").unlink(missing_ok=True)
+                segs.remove(p)
+        if self.retention_bytes > 0:
+            total = sum(p.stat().st_size for p in segs)
+            while segs and total > self.retention_bytes:
+                oldest = segs.pop(0)
+                total -= oldest.stat().st_size
+                oldest.unlink(missing_ok=True)
+                Path(f"{oldest}.idx").unlink(missing_ok=True)
+
+class GuildTagFilter(logging.Filter):
+    """Ajoute `guild_tag` (" g=<id>") au format texte, pour que /logs puisse filtrer par guilde."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        guild = getattr(record, "guild", None)
+        record.guild_tag = f" g={guild}" if guild else ""
+        return True
+
+class EventTimeFilter(logging.Filter):
+    """Horodate le record à l'instant de l'événement (`event_created`, time.time()) et non à
+    l'écriture : les événements vocaux sont loggés en différé, au flush du tampon."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        created = getattr(record, "event_created", None)
+        if created is not None:
+            record.created = created
+            record.msecs = (created - int(created)) * 1000
+        return True
+
 def setup_logging():
     level_name = (os.getenv("LOG_LEVEL") or "INFO").upper()
     level = getattr(logging, level_name, logging.INFO)
     log_file = os.getenv("LOG_FILE") or "logs/bot.log"
+    log_format = (os.getenv("LOG_FORMAT") or "text").lower()            # text | json
     max_bytes = int(os.getenv("LOG_MAX_BYTES") or 1_048_576)
-    backups = int(os.getenv("LOG_BACKUPS") or 5)
+    compression = (os.getenv("LOG_COMPRESSION") or "gzip").lower()      # gzip | zstd | none
+    retention_days = float(os.getenv("LOG_RETENTION_DAYS") or 30)
+    retention_bytes = int(os.getenv("LOG_RETENTION_MAX_BYTES") or 200 * 1_048_576)
 
     Path(log_file).parent.mkdir(parents=True, exist_ok=True)
 
     console_fmt = logging.Formatter("[%(levelname)s] %(name)s: %(message)s")
     file_fmt = logging.Formatter(
-        "%(asctime)s | %(levelname)s | %(name)s | %(filename)s:%(lineno)d | %(message)s",
+        "%(asctime)s | %(levelname)s | %(name)s | %(filename)s:%(lineno)d%(guild_tag)s | %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
 
@@ -76,11 +435,23 @@ def setup_logging():
     ch.setFormatter(console_fmt)
     root.addHandler(ch)
 
-    fh = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+    fh = ArchivingFileHandler(log_file, max_bytes, compression, retention_days, retention_bytes)
     fh.setLevel(level)
-    fh.setFormatter(file_fmt)
+    fh.setFormatter(JsonLineFormatter() if log_format == "json" else file_fmt)
+    fh.addFilter(GuildTagFilter())
     root.addHandler(fh)
 
+    # événements vocaux individuels → JSON à part (le log principal ne reçoit que des résumés en rafale)
+    voice_file = os.getenv("VOICE_EVENTS_FILE") or str(Path(log_file).with_name("voice_events.log"))
+    vh = ArchivingFileHandler(voice_file, max_bytes, compression, retention_days, retention_bytes)
+    vh.setFormatter(JsonLineFormatter())
+    voice_log = logging.getLogger("bot.voice.events")
+    voice_log.setLevel(logging.INFO)
+    voice_log.propagate = False
+    voice_log.addHandler(vh)
+    for lg in (voice_log, logging.getLogger("bot")):
+        lg.addFilter(EventTimeFilter())  # filtre de logger : vaut pour tous ses handlers
+
     # calmer le bruit des libs
     logging.getLogger("discord").setLevel(logging.WARNING)
     logging.getLogger("discord.gateway").setLevel(logging.ERROR)
@@ -92,7 +463,8 @@ def setup_logging():
         lg.setLevel(logging.WARNING)
         lg.propagate = False
 
-    logging.getLogger("bot").info("Logging initialisé (niveau=%s, fichier=%s)", level_name, log_file)
+    logging.getLogger("bot").info("Logging initialisé (niveau=%s, fichier=%s, format=%s, compression=%s)",
+                                  level_name, log_file, log_format, fh.compression)
 
 setup_logging()
 log = logging.getLogger("bot")
@@ -118,6 +490,27 @@ _current_live_state: bool | None = None
 LOG_CHANNEL_ID = int(os.getenv("LOG_CHANNEL_ID", "0")) or None
 LOG_DISCORD_LEVEL = (os.getenv("LOG_DISCORD_LEVEL") or "ERROR").upper()
 
+# Slash commands : defer automatique si le handler n'a pas répondu à temps (Discord coupe à 3 s)
+AUTO_DEFER_AFTER = float(os.getenv("AUTO_DEFER_AFTER", "2.0"))
+
+# Embed builder → envoi multi-salons
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "8"))
+FANOUT_GLOBAL_RATE = float(os.getenv("FANOUT_GLOBAL_RATE", "40"))  # requêtes/s (limite globale Discord: 50)
+FANOUT_MAX_RETRIES = int(os.getenv("FANOUT_MAX_RETRIES", "3"))
+
+# Warm restart (snapshot de l'état au shutdown)
+STATE_FILE = os.getenv("STATE_FILE") or "state/snapshot.json"
+STATE_MAX_AGE = int(os.getenv("STATE_MAX_AGE_SECONDS", "600"))   # au-delà, on repart à froid
+STREAM_URL_TTL = int(os.getenv("STREAM_URL_TTL_SECONDS", "18000"))  # URLs de flux yt-dlp ~6h
+
+# Événements vocaux : regroupement des rafales
+VOICE_COALESCE_WINDOW = float(os.getenv("VOICE_COALESCE_WINDOW", "1.0"))  # secondes
+VOICE_BURST_THRESHOLD = int(os.getenv("VOICE_BURST_THRESHOLD", "8"))      # en dessous : logs individuels
+
+# /logs
+LOGS_SEARCH_LIMIT = int(os.getenv("LOGS_SEARCH_LIMIT", "500"))
+LOGS_PAGE_SIZE = 10
+
 # Musique
 YDL_OPTS = {
     "format": "bestaudio/best",
@@ -129,12 +522,33 @@ YDL_OPTS = {
 }
 FFMPEG_BEFORE = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
 FFMPEG_OPTS = "-vn"
+VOICE_RECONNECT_ATTEMPTS = int(os.getenv("VOICE_RECONNECT_ATTEMPTS", "5"))
+VOICE_RECONNECT_MAX_DELAY = float(os.getenv("VOICE_RECONNECT_MAX_DELAY", "30"))
 
 # ================== Intents & Bot ==================
 intents = discord.Intents.default()
 intents.voice_states = True
 intents.members = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+
+class Bot(commands.Bot):
+    async def setup_hook(self):
+        # SIGTERM (déploiement) → fermeture propre, donc snapshot ; Ctrl+C passe déjà par close()
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows
+
+    async def close(self):
+        # close() peut être rappelé (SIGTERM puis Ctrl+C) : le 2e snapshot écraserait le bon par une liste vide
+        if not self.is_closed():
+            voice_ingest.flush_all()
+            try:
+                write_snapshot()
+            except Exception:
+                log.exception("Snapshot impossible")
+        await super().close()
+
+bot = Bot(command_prefix="!", intents=intents)
 
 # ================== LOGS → SALON DISCORD ==================
 class DiscordChannelHandler(logging.Handler):
@@ -182,41 +596,121 @@ def _place(i: discord.Interaction) -> str:
     c = getattr(i.channel, "name", str(getattr(i.channel, "id", "DM")))
     return f"{g} / {c}"
 
+def _cmd_extra(interaction: discord.Interaction, cmd_name: str, event: str) -> dict:
+    """Champs structurés (mode LOG_FORMAT=json) ; durée = depuis la création de l'interaction."""
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds() * 1000
+    return {
+        "guild": getattr(interaction.guild, "id", None),
+        "user": getattr(interaction.user, "id", None),
+        "command": cmd_name,
+        "event": event,
+        "duration_ms": round(elapsed, 1) if event != "cmd_start" else None,
+    }
+
 def log_cmd_start(interaction: discord.Interaction, cmd_name: str):
-    log.info("▶️ /%s par %s @ %s", cmd_name, _user_tag(interaction.user), _place(interaction))
+    log.info("▶️ /%s par %s @ %s", cmd_name, _user_tag(interaction.user), _place(interaction),
+             extra=_cmd_extra(interaction, cmd_name, "cmd_start"))
 
 def log_cmd_ok(interaction: discord.Interaction, cmd_name: str):
-    log.info("✅ /%s OK pour %s @ %s", cmd_name, _user_tag(interaction.user), _place(interaction))
+    log.info("✅ /%s OK pour %s @ %s", cmd_name, _user_tag(interaction.user), _place(interaction),
+             extra=_cmd_extra(interaction, cmd_name, "cmd_ok"))
 
 def log_cmd_err(interaction: discord.Interaction, cmd_name: str, err: Exception):
-    log.error("❌ /%s ERROR pour %s @ %s → %s", cmd_name, _user_tag(interaction.user), _place(interaction), err, exc_info=err)
+    log.error("❌ /%s ERROR pour %s @ %s → %s", cmd_name, _user_tag(interaction.user), _place(interaction), err, exc_info=err,
+              extra=_cmd_extra(interaction, cmd_name, "cmd_error"))
 
-async def safe_reply(interaction: discord.Interaction, content: str = "", *, embed: discord.Embed | None = None, ephemeral: bool = True):
-    try:
+def reply_lock(interaction: discord.Interaction) -> asyncio.Lock:
+    """Sérialise la 1re réponse d'une interaction : is_done() ne passe à True qu'après l'appel HTTP,
+    donc sans verrou auto_defer et le handler peuvent répondre tous les deux (→ 40060)."""
+    return interaction.extras.setdefault("reply_lock", asyncio.Lock())
+
+async def defer_once(interaction: discord.Interaction, *, ephemeral: bool = True) -> bool:
+    """defer(thinking) si personne n'a encore répondu ; True si c'est nous qui avons deferré."""
+    async with reply_lock(interaction):
         if interaction.response.is_done():
-            await interaction.followup.send(content or None, embed=embed, ephemeral=ephemeral)
-        else:
-            await interaction.response.send_message(content or None, embed=embed, ephemeral=ephemeral)
+            return False
+        await interaction.response.defer(ephemeral=ephemeral, thinking=True)
+        return True
+
+async def safe_reply(interaction: discord.Interaction, content: str = "", *, embed: discord.Embed | None = None,
+                     view: discord.ui.View = discord.utils.MISSING, ephemeral: bool = True):
+    try:
+        async with reply_lock(interaction):
+            if not interaction.response.is_done():
+                await interaction.response.send_message(content or None, embed=embed, view=view, ephemeral=ephemeral)
+                return
+        await interaction.followup.send(content or None, embed=embed, view=view, ephemeral=ephemeral)
     except Exception as e:
         log.warning("[safe_reply] send failed: %s", e)
 
+# ================== AUTO-DEFER (garde-fou 3 s) ==================
+_defer_stats: dict[str, list[int]] = {}  # commande → [appels, auto-defers]
+
+def auto_defer(name: str, *, ephemeral: bool = True):
+    """Décorateur de commande : si le handler n'a pas répondu AUTO_DEFER_AFTER s après la création
+    de l'interaction, on defer (l'utilisateur voit « réfléchit… ») puis le handler continue ;
+    safe_reply bascule sur followup. Les réponses directes doivent passer par safe_reply/defer_once.
+
+    À placer juste au-dessus du `async def`, sous les décorateurs app_commands.
+    """
+    def deco(func):
+        @functools.wraps(func)
+        async def wrapper(interaction: discord.Interaction, *args, **kwargs):
+            stats = _defer_stats.setdefault(name, [0, 0])
+            stats[0] += 1
+            task = asyncio.create_task(func(interaction, *args, **kwargs))
+            # budget compté depuis la création (latence gateway + file d'attente déjà consommées)
+            age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+            done, _ = await asyncio.wait({task}, timeout=max(0.0, AUTO_DEFER_AFTER - age))
+            if not done:
+                try:
+                    if await defer_once(interaction, ephemeral=ephemeral):
+                        stats[1] += 1
+                        age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+                        log.info("⏱️ /%s auto-defer après %.1fs (%d/%d appels)", name, age, stats[1], stats[0],
+                                 extra=_cmd_extra(interaction, name, "cmd_auto_defer"))
+                except discord.HTTPException as e:
+                    log.debug("[auto_defer] /%s: %s", name, e)  # interaction expirée
+            return await task
+        return wrapper
+    return deco
+
+def defer_stats_line() -> str:
+    hot = sorted(((d, c, n) for n, (c, d) in _defer_stats.items() if d), reverse=True)[:5]
+    return " · ".join(f"/{n} {d}/{c}" for d, c, n in hot) or "aucun"
+
+# ================== INVITE (cache) ==================
+_invite_url: str | None = None
+
+async def get_invite_url() -> str:
+    """URL d'invitation ; application_info() n'est appelé qu'une fois (au on_ready ou au 1er /invite)."""
+    global _invite_url
+    if _invite_url is None:
+        app_info = await bot.application_info()
+        permissions = discord.Permissions(permissions=0)
+        permissions.update(view_channel=True, send_messages=True, embed_links=True, read_message_history=True, use_application_commands=True)
+        _invite_url = discord.utils.oauth_url(app_info.id, permissions=permissions, scopes=("bot", "applications.commands"))
+    return _invite_url
+
 # ================== VOICE HELPERS ==================
 _vc_connect_lock = asyncio.Lock()
 
-def build_ffmpeg_source(stream_url: str) -> FFmpegPCMAudio:
+def build_ffmpeg_source(stream_url: str, start: float = 0.0) -> FFmpegPCMAudio:
+    before = FFMPEG_BEFORE
+    if start > 0:
+        before = f"{before} -ss {start:.2f}"  # seek côté entrée → pas de décodage du début
     return FFmpegPCMAudio(
         stream_url,
         executable=FFMPEG_EXE,
-        before_options=FFMPEG_BEFORE,
+        before_options=before,
         options=FFMPEG_OPTS,
     )
 
 async def ensure_connected_to_user_vc(interaction: discord.Interaction) -> discord.VoiceClient | None:
-    if not interaction.response.is_done():
-        try:
-            await interaction.response.defer(ephemeral=False, thinking=True)
-        except Exception:
-            pass
+    try:
+        await defer_once(interaction, ephemeral=False)
+    except Exception:
+        pass
 
     if not interaction.user or not isinstance(interaction.user, discord.Member):
         await safe_reply(interaction, "Impossible de trouver ton salon vocal.")
@@ -245,6 +739,149 @@ async def ensure_connected_to_user_vc(interaction: discord.Interaction) -> disco
             log.exception("Voice connect error")
         return None
 
+# ================== MUSIQUE — suivi de lecture & reprise après coupure ==================
+def extract_track(query: str) -> dict | None:
+    """Résout une recherche/lien via yt-dlp (bloquant). None si aucun résultat."""
+    with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
+        info = ydl.extract_info(query, download=False)
+    if "entries" in info:
+        info = next((e for e in info["entries"] if e), None)
+    return info or None
+
+class Playback:
+    """Piste en cours d'une guilde : de quoi relancer ffmpeg au bon endroit après une coupure vocale."""
+    def __init__(self, guild_id: int, channel_id: int, title: str, page_url: str, stream_url: str,
+                 duration: float | None = None, offset: float = 0.0, extracted_at: float | None = None):
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.title = title
+        self.page_url = page_url
+        self.stream_url = stream_url
+        self.duration = duration
+        self.offset = offset                       # position (s) au dernier (re)démarrage
+        self.extracted_at = extracted_at or time.time()  # âge de stream_url (elle expire)
+        self._started: float = time.monotonic()
+        self._paused_at: float | None = None
+
+    def elapsed(self) -> float:
+        end = self._paused_at if self._paused_at is not None else time.monotonic()
+        return self.offset + (end - self._started)
+
+    def pause(self):
+        if self._paused_at is None:
+            self._paused_at = time.monotonic()
+
+    def resume(self):
+        if self._paused_at is not None:
+            self._started += time.monotonic() - self._paused_at
+            self._paused_at = None
+
+    def restart_at(self, position: float):
+        self.offset = position
+        self._started = time.monotonic()
+        self._paused_at = None
+
+    def finished(self) -> bool:
+        return bool(self.duration) and self.elapsed() >= self.duration - 1
+
+    @property
+    def paused(self) -> bool:
+        return self._paused_at is not None
+
+    def to_dict(self) -> dict:
+        return {"guild_id": self.guild_id, "channel_id": self.channel_id, "title": self.title,
+                "page_url": self.page_url, "stream_url": self.stream_url, "duration": self.duration,
+                "position": self.elapsed(), "paused": self.paused, "extracted_at": self.extracted_at}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Playback":
+        """Horloge figée à la position du snapshot : start_playback la relance (cf. d["paused"])."""
+        pb = cls(d["guild_id"], d["channel_id"], d["title"], d["page_url"], d["stream_url"],
+                 d.get("duration"), d.get("position", 0.0), d.get("extracted_at"))
+        pb._paused_at = pb._started  # ni connexion ni yt-dlp ne doivent faire avancer la piste
+        return pb
+
+_playback: dict[int, Playback] = {}  # guild_id → piste en cours
+_reconnecting: set[int] = set()      # guildes dont la reprise est en cours (ou en attente, cf. _after)
+
+def start_playback(vc: discord.VoiceClient, pb: Playback):
+    """Lance (ou relance) `pb` sur `vc` à pb.offset et l'enregistre comme piste courante."""
+    _playback[pb.guild_id] = pb
+    source = build_ffmpeg_source(pb.stream_url, start=pb.offset)
+
+    def _after(err: Exception | None):
+        if _playback.get(pb.guild_id) is pb:
+            # Coupure réseau : discord.py arrête le player puis quitte le salon, et l'écho
+            # VOICE_STATE_UPDATE (channel=None) arrive ensuite ; marqué ici, depuis le thread du
+            # player, il n'est pas pris pour un kick. Un kick, lui, arrive avant l'arrêt du player.
+            _reconnecting.add(pb.guild_id)
+        if err:
+            log.info("[PLAY] terminé: %s", err)
+        else:
+            log.info("[PLAY] terminé.")
+        asyncio.run_coroutine_threadsafe(_on_track_end(vc, pb), bot.loop)
+
+    pb.restart_at(pb.offset)
+    vc.play(source, after=_after)
+
+def forget_playback(guild_id: int):
+    """À appeler AVANT un stop/leave volontaire, pour ne pas déclencher la reprise."""
+    _playback.pop(guild_id, None)
+
+async def _on_track_end(vc: discord.VoiceClient, pb: Playback):
+    try:
+        if _playback.get(pb.guild_id) is not pb or bot.is_closed():
+            return  # arrêt volontaire, kick, piste remplacée ou extinction du bot
+        await asyncio.sleep(0.5)  # laisse discord.py finir de marquer la déconnexion
+        if vc.is_connected() or pb.finished():
+            forget_playback(pb.guild_id)  # fin normale
+            return
+        await resume_after_disconnect(pb)
+    finally:
+        _reconnecting.discard(pb.guild_id)
+
+async def resume_after_disconnect(pb: Playback, connect=None) -> discord.VoiceClient | None:
+    """Reconnecte avec backoff exponentiel puis relance la piste à la dernière position (ffmpeg -ss).
+
+    `connect` (channel → VoiceClient) est injectable pour simuler une coupure.
+    """
+    position = pb.elapsed()
+    was_paused = pb.paused
+    pb.pause()  # gèle la position pendant les tentatives
+    _reconnecting.add(pb.guild_id)  # notre propre disconnect(force) ne doit pas passer pour un kick
+    try:
+        delay = 1.0
+        for attempt in range(1, VOICE_RECONNECT_ATTEMPTS + 1):
+            if _playback.get(pb.guild_id) is not pb or bot.is_closed():
+                return None  # /stop, /leave, /play ou extinction entre-temps
+            try:
+                channel = bot.get_channel(pb.channel_id) or await bot.fetch_channel(pb.channel_id)
+                async with _vc_connect_lock:
+                    vc = channel.guild.voice_client
+                    if not (vc and vc.is_connected()):
+                        if vc:
+                            await vc.disconnect(force=True)
+                        if connect is not None:
+                            vc = await connect(channel)
+                        else:
+                            vc = await channel.connect(self_deaf=True, reconnect=False, timeout=12)
+                pb.offset = position
+                start_playback(vc, pb)
+                if was_paused:
+                    vc.pause()
+                    pb.pause()
+                log.info("🔁 Reprise de '%s' à %.1fs (tentative %d)", pb.title, position, attempt)
+                return vc
+            except Exception as e:
+                log.warning("Reconnexion vocale %d/%d échouée: %s", attempt, VOICE_RECONNECT_ATTEMPTS, e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, VOICE_RECONNECT_MAX_DELAY)
+        log.error("Abandon de la reprise de '%s' après %d tentatives.", pb.title, VOICE_RECONNECT_ATTEMPTS)
+        forget_playback(pb.guild_id)
+        return None
+    finally:
+        _reconnecting.discard(pb.guild_id)
+
 # ================== TIKTOK (optionnel) ==================
 async def set_live_channel_name(is_live: bool):
     global _current_live_state
@@ -279,9 +916,227 @@ async def tiktok_watch_loop():
             log.warning("TikTok watch error: %s", e)
         await asyncio.sleep(TIKTOK_POLL_SECONDS)
 
+# ================== ÉVÉNEMENTS VOCAUX — regroupement des rafales ==================
+voice_events_log = logging.getLogger("bot.voice.events")
+
+class VoiceEvent:
+    """Un changement d'état vocal d'un membre (message prêt à logger + clés de regroupement)."""
+    __slots__ = ("level", "event", "guild_id", "user_id", "src", "dst", "state", "fmt", "args", "created")
+
+    def __init__(self, level: int, event: str, member: discord.Member, fmt: str, *args,
+                 src: str | None = None, dst: str | None = None, state: bool | None = None):
+        self.level = level
+        self.event = event
+        self.guild_id = member.guild.id
+        self.user_id = member.id
+        self.src = src
+        self.dst = dst
+        self.state = state
+        self.fmt = fmt
+        self.args = (member.display_name, *args)
+        self.created = time.time()  # écrit au flush, mais horodaté ici (cf. EventTimeFilter)
+
+    def extra(self) -> dict:
+        return {"guild": self.guild_id, "user": self.user_id, "command": None, "event": self.event, "duration_ms": None,
+                "event_created": self.created}
+
+def describe_voice_change(member: discord.Member, before: discord.VoiceState, after: discord.VoiceState) -> list[VoiceEvent]:
+    out: list[VoiceEvent] = []
+    if before.channel is None and after.channel is not None:
+        out.append(VoiceEvent(logging.INFO, "voice_join", member, "🔊 %s a rejoint %s", after.channel.name, dst=after.channel.name))
+    elif before.channel is not None and after.channel is None:
+        out.append(VoiceEvent(logging.INFO, "voice_leave", member, "🔇 %s a quitté %s", before.channel.name, src=before.channel.name))
+    elif before.channel and after.channel and before.channel.id != after.channel.id:
+        out.append(VoiceEvent(logging.INFO, "voice_move", member, "🔁 %s est passé de %s → %s", before.channel.name, after.channel.name,
+                              src=before.channel.name, dst=after.channel.name))
+    if before.self_mute != after.self_mute:
+        out.append(VoiceEvent(logging.INFO, "voice_self_mute", member, "🤐 %s %s (self-mute)",
+                              "s'est **muté**" if after.self_mute else "s'est **démuté**", state=after.self_mute))
+    if before.self_deaf != after.self_deaf:
+        out.append(VoiceEvent(logging.INFO, "voice_self_deaf", member, "🙉 %s %s (self-deaf)",
+                              "s'est **deaf**" if after.self_deaf else "n'est plus **deaf**", state=after.self_deaf))
+    if before.mute != after.mute:
+        out.append(VoiceEvent(logging.WARNING, "voice_server_mute", member, "⛔ %s %s",
+                              "a été **server-mute**" if after.mute else "n'est plus **server-mute**", state=after.mute))
+    if before.deaf != after.deaf:
+        out.append(VoiceEvent(logging.WARNING, "voice_server_deaf", member, "⛔ %s %s",
+                              "a été **server-deaf**" if after.deaf else "n'est plus **server-deaf**", state=after.deaf))
+    if before.self_stream != after.self_stream:
+        out.append(VoiceEvent(logging.INFO, "voice_stream", member, "📡 %s %s le **stream**",
+                              "a démarré" if after.self_stream else "a coupé", state=after.self_stream))
+    if before.self_video != after.self_video:
+        out.append(VoiceEvent(logging.INFO, "voice_video", member, "🎥 %s a %s sa caméra",
+                              "allumé" if after.self_video else "éteint", state=after.self_video))
+    return out
+
+# libellés des résumés : (event, état) → texte après "N membres"
+_VOICE_SUMMARY = {
+    ("voice_self_mute", True): "se sont mutés", ("voice_self_mute", False): "se sont démutés",
+    ("voice_self_deaf", True): "se sont mis en deaf", ("voice_self_deaf", False): "ne sont plus deaf",
+    ("voice_server_mute", True): "ont été **server-mute**", ("voice_server_mute", False): "ne sont plus **server-mute**",
+    ("voice_server_deaf", True): "ont été **server-deaf**", ("voice_server_deaf", False): "ne sont plus **server-deaf**",
+    ("voice_stream", True): "ont démarré un stream", ("voice_stream", False): "ont coupé leur stream",
+    ("voice_video", True): "ont allumé leur caméra", ("voice_video", False): "ont éteint leur caméra",
+}
+
+def summarize_voice_events(events: list[VoiceEvent]) -> list[tuple[int, str]]:
+    """Regroupe une rafale en lignes de résumé (niveau, message), dans l'ordre de première apparition."""
+    groups: dict[tuple, list[VoiceEvent]] = {}
+    for ev in events:
+        groups.setdefault((ev.event, ev.src, ev.dst, ev.state), []).append(ev)
+    lines = []
+    for (event, src, dst, state), evs in groups.items():
+        n = len({ev.user_id for ev in evs})
+        if event == "voice_join":
+            text = f"🔊 {n} membres ont rejoint #{dst}"
+        elif event == "voice_leave":
+            text = f"🔇 {n} membres ont quitté #{src}"
+        elif event == "voice_move":
+            text = f"🔁 {n} membres déplacés #{src} → #{dst}"
+        else:
+            text = f"📦 {n} membres {_VOICE_SUMMARY.get((event, state), event)}"
+        lines.append((max(ev.level for ev in evs), text))
+    return lines
+
+class VoiceEventCoalescer:
+    """Tampon par guilde des événements vocaux, vidé `window` secondes après le premier.
+
+    Chaque événement est toujours écrit dans `voice_events_log` (JSON), depuis un thread pour ne pas
+    bloquer la boucle pendant une rafale. Le log principal reçoit les lignes individuelles si la
+    rafale est petite, sinon un résumé par groupe.
+    """
+    def __init__(self, window: float, threshold: int):
+        self.window = window
+        self.threshold = threshold
+        self._buffers: dict[int, list[VoiceEvent]] = {}
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+
+    def add(self, guild_id: int, events: list[VoiceEvent]):
+        buf = self._buffers.setdefault(guild_id, [])
+        buf.extend(events)
+        if guild_id not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[guild_id] = loop.call_later(self.window, self.flush, guild_id)
+
+    @staticmethod
+    def _record(events: list[VoiceEvent]):
+        for ev in events:
+            voice_events_log.log(ev.level, ev.fmt, *ev.args, extra=ev.extra())
+
+    def flush(self, guild_id: int, sync: bool = False):
+        timer = self._timers.pop(guild_id, None)
+        if timer:
+            timer.cancel()
+        events = self._buffers.pop(guild_id, [])
+        if not events:
+            return
+        if sync:
+            self._record(events)
+        else:
+            asyncio.get_running_loop().run_in_executor(None, self._record, events)
+        if len(events) < self.threshold:
+            for ev in events:
+                log.log(ev.level, ev.fmt, *ev.args, extra=ev.extra())
+            return
+        extra = {"guild": guild_id, "user": None, "command": None, "event": "voice_burst", "duration_ms": None,
+                 "event_created": events[0].created}  # début de la rafale
+        for level, text in summarize_voice_events(events):
+            log.log(level, text, extra=extra)
+
+    def flush_all(self):
+        """Vide tout immédiatement (arrêt du bot)."""
+        for gid in list(self._buffers):
+            self.flush(gid, sync=True)
+
+voice_ingest = VoiceEventCoalescer(VOICE_COALESCE_WINDOW, VOICE_BURST_THRESHOLD)
+
+# ================== WARM RESTART (snapshot / restauration) ==================
+_restore_done = False
+
+def write_snapshot(path: str = STATE_FILE):
+    """Écrit l'état runtime (vocal, lecture, brouillons, état live) avant l'arrêt."""
+    voice = []
+    for vc in bot.voice_clients:
+        if not vc.is_connected():
+            continue
+        pb = _playback.get(vc.guild.id)
+        voice.append({"guild_id": vc.guild.id, "channel_id": vc.channel.id, "playback": pb.to_dict() if pb else None})
+    drafts = {
+        str(uid): {"draft": view.draft.to_dict(), "extra_channel_ids": view.extra_channel_ids}
+        for uid, view in _open_builders.items()
+    }
+    snap = {"v": 1, "saved_at": time.time(), "live_state": _current_live_state, "voice": voice, "drafts": drafts}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snap, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    log.info("💾 Snapshot écrit: %d vocal(aux), %d brouillon(s)", len(voice), len(drafts))
+
+def read_snapshot(path: str = STATE_FILE) -> dict | None:
+    """Lit puis supprime le snapshot (usage unique) ; None s'il est absent, illisible ou trop vieux."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            snap = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning("Snapshot illisible: %s", e)
+        snap = None
+    Path(path).unlink(missing_ok=True)
+    if not snap or time.time() - snap.get("saved_at", 0) > STATE_MAX_AGE:
+        return None
+    return snap
+
+async def _restore_voice(entry: dict):
+    channel = bot.get_channel(entry["channel_id"]) or await bot.fetch_channel(entry["channel_id"])
+    async with _vc_connect_lock:
+        vc = channel.guild.voice_client
+        if not (vc and vc.is_connected()):
+            vc = await channel.connect(self_deaf=True, reconnect=False, timeout=12)
+    data = entry.get("playback")
+    if not data:
+        return
+    pb = Playback.from_dict(data)
+    if pb.finished():
+        return
+    if time.time() - pb.extracted_at > STREAM_URL_TTL and yt_dlp is not None:
+        info = await asyncio.to_thread(extract_track, pb.page_url)
+        if not info or not info.get("url"):
+            log.warning("Reprise impossible de '%s': ré-extraction vide", pb.title)
+            return
+        pb.stream_url, pb.extracted_at = info["url"], time.time()
+    paused = bool(data.get("paused"))
+    start_playback(vc, pb)  # pb.offset == position du snapshot
+    if paused:
+        vc.pause()
+        pb.pause()
+    log.info("♻️ Warm restart: '%s' relancé à %.1fs, %.2fs après le démarrage du process",
+             pb.title, pb.offset, time.monotonic() - PROCESS_START)
+
+def restore_snapshot_state(snap: dict):
+    """Partie synchrone : à appliquer avant le premier tour de la boucle TikTok."""
+    global _current_live_state
+    _current_live_state = snap.get("live_state")  # évite un renommage inutile au boot
+    _restored_drafts.update({int(uid): d for uid, d in snap.get("drafts", {}).items()})
+
+async def restore_snapshot_voice(snap: dict):
+    results = await asyncio.gather(*(_restore_voice(e) for e in snap.get("voice", [])), return_exceptions=True)
+    for entry, res in zip(snap.get("voice", []), results):
+        if isinstance(res, Exception):
+            log.warning("Warm restart: salon %s non restauré: %s", entry.get("channel_id"), res)
+
 # ================== EVENTS ==================
 @bot.event
 async def on_ready():
+    global _restore_done
+    first_ready = not _restore_done  # on_ready peut être rappelé après une reconnexion gateway
+    if first_ready:
+        _restore_done = True
+        snap = read_snapshot()
+        if snap:
+            restore_snapshot_state(snap)
+            asyncio.create_task(restore_snapshot_voice(snap))  # avant la sync des commandes (lente)
     await bot.change_presence(activity=discord.Activity(type=discord.ActivityType.listening, name="vos commandes /"))
     try:
         if GUILD_IDS:
@@ -299,31 +1154,26 @@ async def on_ready():
     except Exception as e:
         log.exception("Erreur de sync des commandes: %s", e)
 
-    asyncio.create_task(tiktok_watch_loop())
+    if first_ready:
+        asyncio.create_task(tiktok_watch_loop())
+        try:
+            await get_invite_url()
+        except Exception as e:
+            log.warning("application_info() indisponible au démarrage: %s", e)
     log.info("Bot prêt: %s (ID: %s)", bot.user, bot.user.id)
 
 @bot.event
 async def on_voice_state_update(member: discord.Member, before: discord.VoiceState, after: discord.VoiceState):
+    if bot.user and member.id == bot.user.id and member.guild.id not in _reconnecting:
+        if after.channel is None:
+            forget_playback(member.guild.id)  # "Déconnecter" par un modo → pas de reprise
+        elif pb := _playback.get(member.guild.id):
+            pb.channel_id = after.channel.id  # déplacé : la reprise doit viser le nouveau salon
     if member.bot:
         return
-    if before.channel is None and after.channel is not None:
-        log.info("🔊 %s a rejoint %s", member.display_name, after.channel.name)
-    elif before.channel is not None and after.channel is None:
-        log.info("🔇 %s a quitté %s", member.display_name, before.channel.name)
-    elif before.channel and after.channel and before.channel.id != after.channel.id:
-        log.info("🔁 %s est passé de %s → %s", member.display_name, before.channel.name, after.channel.name)
-    if before.self_mute != after.self_mute:
-        log.info("🤐 %s %s (self-mute)", member.display_name, "s'est **muté**" if after.self_mute else "s'est **démuté**")
-    if before.self_deaf != after.self_deaf:
-        log.info("🙉 %s %s (self-deaf)", member.display_name, "s'est **deaf**" if after.self_deaf else "n'est plus **deaf**")
-    if before.mute != after.mute:
-        log.warning("⛔ %s %s", member.display_name, "a été **server-mute**" if after.mute else "n'est plus **server-mute**")
-    if before.deaf != after.deaf:
-        log.warning("⛔ %s %s", member.display_name, "a été **server-deaf**" if after.deaf else "n'est plus **server-deaf**")
-    if before.self_stream != after.self_stream:
-        log.info("📡 %s %s le **stream**", member.display_name, "a démarré" if after.self_stream else "a coupé")
-    if before.self_video != after.self_video:
-        log.info("🎥 %s a %s sa caméra", member.display_name, "allumé" if after.self_video else "éteint")
+    events = describe_voice_change(member, before, after)
+    if events:
+        voice_ingest.add(member.guild.id, events)
 
 @bot.event
 async def on_member_update(before: discord.Member, after: discord.Member):
@@ -337,13 +1187,7 @@ async def on_member_update(before: discord.Member, after: discord.Member):
 @bot.tree.error
 async def on_app_command_error(interaction: discord.Interaction, error: Exception):
     log_cmd_err(interaction, interaction.command.name if interaction.command else "unknown", error)
-    try:
-        if not interaction.response.is_done():
-            await interaction.response.send_message("❌ Une erreur est survenue pendant la commande.", ephemeral=True)
-        else:
-            await interaction.followup.send("❌ Une erreur est survenue pendant la commande.", ephemeral=True)
-    except Exception:
-        pass
+    await safe_reply(interaction, "❌ Une erreur est survenue pendant la commande.")
 
 # ================== EMBED BUILDER — Helpers Couleur ==================
 COLOR_NAMES = {
@@ -365,10 +1209,26 @@ def parse_color(value: str | None) -> discord.Color | None:
     except Exception:
         return None
 
+# ================== EMBED BUILDER — Limites Discord ==================
+EMBED_MAX_TOTAL = 6000    # somme titre + description + author + footer + fields
+EMBED_MAX_FIELDS = 25
+EMBED_TEXT_LIMITS = {"title": 256, "description": 4096, "author_name": 256, "footer_text": 2048}
+FIELD_NAME_MAX = 256
+FIELD_VALUE_MAX = 1024
+
+def _field_len(name: str, value: str) -> int:
+    # to_embed() remplace les vides par \u200b → 1 caractère chacun côté Discord
+    return len(name or "\u200b") + len(value or "\u200b")
+
 # ================== EMBED BUILDER — Core ==================
 class EmbedDraft:
-    """État de l'embed en cours d'édition."""
+    """État de l'embed en cours d'édition (avec compteur de caractères tenu à jour)."""
     def __init__(self):
+        self._chars = 0      # total courant compté par Discord
+        self._rev = 0        # incrémenté à chaque mutation → invalide les caches
+        self._validated: tuple[int, list[str]] | None = None
+        self._fields: List[tuple[str, str, bool]] = []  # (name, value, inline)
+
         self.title: str | None = None
         self.description: str | None = None
         self.url: str | None = None
@@ -385,7 +1245,116 @@ class EmbedDraft:
         self.image_url: Optional[str] = None
         self.thumb_url: Optional[str] = None
 
-        self.fields: List[tuple[str, str, bool]] = []  # (name, value, inline)
+    def __setattr__(self, name, value):
+        if name in EMBED_TEXT_LIMITS:
+            old = self.__dict__.get(name)
+            self.__dict__["_chars"] += len(value or "") - len(old or "")
+        object.__setattr__(self, name, value)
+        if not name.startswith("_"):
+            self.__dict__["_rev"] += 1
+
+    # --- compteurs
+    @property
+    def chars(self) -> int:
+        return self._chars
+
+    @property
+    def remaining(self) -> int:
+        return EMBED_MAX_TOTAL - self._chars
+
+    @property
+    def fields(self) -> tuple[tuple[str, str, bool], ...]:
+        return tuple(self._fields)
+
+    # --- fields (toujours passer par ces méthodes pour garder le compteur juste)
+    def add_field(self, name: str, value: str, inline: bool = True):
+        self._fields.append((name, value, inline))
+        self._chars += _field_len(name, value)
+        self._rev += 1
+
+    def set_field(self, index: int, name: str, value: str, inline: bool = True):
+        old_n, old_v, _ = self._fields[index]
+        self._fields[index] = (name, value, inline)
+        self._chars += _field_len(name, value) - _field_len(old_n, old_v)
+        self._rev += 1
+
+    def remove_field(self, index: int):
+        n, v, _ = self._fields.pop(index)
+        self._chars -= _field_len(n, v)
+        self._rev += 1
+
+    # --- ajustement aux limites (appelé par les modals avant l'aperçu)
+    def clip_text(self, attr: str, value: str | None) -> tuple[str | None, bool]:
+        """Tronque `value` pour qu'il tienne si on l'assigne à `attr`. Renvoie (valeur, tronqué?)."""
+        if not value:
+            return value, False
+        budget = self.remaining + len(getattr(self, attr) or "")
+        limit = max(0, min(EMBED_TEXT_LIMITS[attr], budget))
+        if len(value) <= limit:
+            return value, False
+        return (value[:limit] or None), True
+
+    def clip_field(self, name: str, value: str, index: Optional[int] = None) -> tuple[str, str, bool] | None:
+        """Tronque un field pour qu'il tienne. None si impossible (25 fields atteints ou plus de place)."""
+        budget = self.remaining
+        if index is None:
+            if len(self._fields) >= EMBED_MAX_FIELDS:
+                return None
+        else:
+            budget += _field_len(*self._fields[index][:2])
+        name = name[:FIELD_NAME_MAX]
+        value = value[:FIELD_VALUE_MAX]
+        truncated = False
+        over = _field_len(name, value) - budget
+        if over > 0:
+            keep = len(value) - over
+            if keep < 1:
+                return None
+            value, truncated = value[:keep], True
+        return name, value, truncated
+
+    def validate(self) -> list[str]:
+        """Liste des dépassements de limites (mise en cache tant que le draft ne change pas)."""
+        if self._validated and self._validated[0] == self._rev:
+            return self._validated[1]
+        problems: list[str] = []
+        for attr, limit in EMBED_TEXT_LIMITS.items():
+            if len(getattr(self, attr) or "") > limit:
+                problems.append(f"{attr} > {limit} caractères")
+        if len(self._fields) > EMBED_MAX_FIELDS:
+            problems.append(f"plus de {EMBED_MAX_FIELDS} fields")
+        for idx, (n, v, _) in enumerate(self._fields):
+            if len(n) > FIELD_NAME_MAX or len(v) > FIELD_VALUE_MAX:
+                problems.append(f"field {idx+1} trop long")
+        if self._chars > EMBED_MAX_TOTAL:
+            problems.append(f"total {self._chars} > {EMBED_MAX_TOTAL} caractères")
+        self._validated = (self._rev, problems)
+        return problems
+
+    _SAVED = ("title", "description", "url", "timestamp", "author_name", "author_icon", "author_url",
+              "footer_text", "footer_icon", "image_url", "thumb_url")
+
+    def to_dict(self) -> dict:
+        d = {k: getattr(self, k) for k in self._SAVED}
+        d["color"] = self.color.value if self.color else None
+        d["fields"] = [list(f) for f in self._fields]
+        return d
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "EmbedDraft":
+        draft = cls()
+        for k in cls._SAVED:
+            if k in d:
+                setattr(draft, k, d[k])  # via __setattr__ → compteur à jour
+        if "color" in d:
+            c = d["color"]
+            draft.color = discord.Color(c) if c is not None else None  # None ≠ blurple par défaut
+        for n, v, inline in d.get("fields", []):
+            draft.add_field(n, v, inline)
+        return draft
+
+    def budget_line(self) -> str:
+        return f"📏 {self._chars}/{EMBED_MAX_TOTAL} caractères · {len(self._fields)}/{EMBED_MAX_FIELDS} fields"
 
     def to_embed(self) -> discord.Embed:
         emb = discord.Embed(
@@ -408,28 +1377,195 @@ class EmbedDraft:
             emb.set_image(url=self.image_url)
         if self.thumb_url:
             emb.set_thumbnail(url=self.thumb_url)
-        for n, v, inline in self.fields:
+        for n, v, inline in self._fields:
             emb.add_field(name=n or "\u200b", value=v or "\u200b", inline=inline)
         return emb
 
 # --------- utilitaire d’aperçu (FIX STABLE) ---------
-async def update_preview(itx: discord.Interaction, draft: "EmbedDraft", view: discord.ui.View, edit_only: bool = False):
+def preview_content(draft: "EmbedDraft", header: str = "**Aperçu** — modifie via les boutons :", notice: str | None = None) -> str:
+    lines = [header, draft.budget_line()]
+    problems = draft.validate()
+    if problems:
+        lines.append("⚠️ " + " · ".join(problems))
+    if notice:
+        lines.append(notice)
+    return "\n".join(lines)
+
+async def update_preview(itx: discord.Interaction, draft: "EmbedDraft", view: discord.ui.View, edit_only: bool = False, notice: str | None = None):
     emb = draft.to_embed()
+    content = preview_content(draft, notice=notice)
     try:
         if itx.response.is_done():
-            await itx.edit_original_response(content="**Aperçu** — modifie via les boutons :", embed=emb, view=view)
+            await itx.edit_original_response(content=content, embed=emb, view=view)
         else:
             if edit_only:
                 await itx.response.defer()
-                await itx.edit_original_response(content="**Aperçu** — modifie via les boutons :", embed=emb, view=view)
+                await itx.edit_original_response(content=content, embed=emb, view=view)
             else:
-                await itx.response.edit_message(content="**Aperçu** — modifie via les boutons :", embed=emb, view=view)
+                await itx.response.edit_message(content=content, embed=emb, view=view)
     except Exception:
         try:
-            await itx.followup.send(content="**Aperçu mis à jour** :", embed=emb, ephemeral=True)
+            await itx.followup.send(content=preview_content(draft, "**Aperçu mis à jour** :", notice), embed=emb, ephemeral=True)
         except Exception:
             pass
 
+TRUNC_NOTICE = "✂️ Texte tronqué pour respecter les limites Discord."
+
+# ================== EMBED BUILDER — Envoi multi-salons ==================
+class RateBucket:
+    """Token bucket asyncio : `rate` jetons/s, rafale max `capacity`. `pause()` gèle tout le bucket (429 global)."""
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._stamp: float | None = None
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        loop = asyncio.get_running_loop()
+        self._paused_until = max(self._paused_until, loop.time() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self._stamp is None:
+                    self._stamp = now
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+fanout_bucket = RateBucket(FANOUT_GLOBAL_RATE)  # un seul pour le process : la limite globale Discord est par bot
+
+def _retry_after(err: discord.HTTPException) -> tuple[float, bool]:
+    """(délai conseillé par le serveur, 429 global ?) à partir d'une réponse 429."""
+    delay = getattr(err, "retry_after", None)
+    headers = getattr(getattr(err, "response", None), "headers", None) or {}
+    if delay is None:
+        try:
+            delay = float(headers.get("Retry-After", 1))
+        except (TypeError, ValueError):
+            delay = 1.0
+    is_global = str(headers.get("X-RateLimit-Global", "")).lower() == "true"
+    return float(delay), is_global
+
+async def send_embed_fanout(
+    client: discord.Client,
+    channel_ids: list[int],
+    embed: discord.Embed,
+    *,
+    bucket: RateBucket | None = None,
+) -> dict[int, str | None]:
+    """Envoie le même embed dans chaque salon, en parallèle. Renvoie {channel_id: None si OK, sinon raison}.
+
+    Un seul envoi en vol par salon (retries séquentiels) ; `fanout_bucket`, partagé par tous les
+    envois en cours, borne le débit total et un 429 global le gèle pour tout le monde. discord.py
+    gère en plus ses buckets par route. `bucket` ne sert qu'aux benchs.
+    """
+    bucket = bucket or fanout_bucket
+    sem = asyncio.Semaphore(FANOUT_CONCURRENCY)
+    results: dict[int, str | None] = {}
+
+    async def _one(cid: int):
+        async with sem:
+            for attempt in range(FANOUT_MAX_RETRIES + 1):
+                await bucket.acquire()
+                try:
+                    ch = client.get_channel(cid) or await client.fetch_channel(cid)
+                    await ch.send(embed=embed)
+                    results[cid] = None
+                    return
+                except discord.Forbidden:
+                    results[cid] = "permission insuffisante"
+                    return
+                except discord.NotFound:
+                    results[cid] = "salon introuvable"
+                    return
+                except discord.HTTPException as e:
+                    if e.status == 429 and attempt < FANOUT_MAX_RETRIES:
+                        delay, is_global = _retry_after(e)
+                        log.warning("[fanout] 429 sur %s → retry dans %.2fs (global=%s)", cid, delay, is_global)
+                        if is_global:
+                            bucket.pause(delay)
+                        await asyncio.sleep(delay)
+                        continue
+                    results[cid] = f"HTTP {e.status}: {e.text or e}"
+                    return
+                except Exception as e:
+                    results[cid] = str(e)
+                    return
+
+    await asyncio.gather(*(_one(cid) for cid in dict.fromkeys(channel_ids)))
+    return results
+
+def fanout_report(results: dict[int, str | None]) -> str:
+    ok = sum(1 for r in results.values() if r is None)
+    lines = [f"✅ Embed envoyé dans **{ok}/{len(results)}** salon(s)."]
+    for cid, reason in results.items():
+        if reason is not None:
+            lines.append(f"❌ <#{cid}> — {reason}")
+    return "\n".join(lines)[:1900]
+
+async def member_send_denial(client: discord.Client, user_id: int, channel_id: int) -> str | None:
+    """Raison du refus si `user_id` ne peut pas poster d'embed dans `channel_id` (None = autorisé)."""
+    try:
+        ch = client.get_channel(channel_id) or await client.fetch_channel(channel_id)
+    except (discord.NotFound, discord.Forbidden):
+        return "salon introuvable"
+    except discord.HTTPException as e:
+        return f"HTTP {e.status}"
+    guild = getattr(ch, "guild", None)
+    if guild is None:
+        return "pas un salon de serveur"
+    member = guild.get_member(user_id)
+    if member is None:
+        try:
+            member = await guild.fetch_member(user_id)
+        except discord.NotFound:
+            return "tu n'es pas membre de ce serveur"
+        except discord.HTTPException as e:
+            return f"HTTP {e.status}"
+    perms = ch.permissions_for(member)
+    if not (perms.send_messages and perms.embed_links):
+        return "permission insuffisante"
+    return None
+
+async def filter_allowed_channels(client: discord.Client, user_id: int, channel_ids: list[int]) -> tuple[list[int], dict[int, str]]:
+    """(salons autorisés, {salon refusé: raison}) pour l'utilisateur qui construit l'embed."""
+    reasons = await asyncio.gather(*(member_send_denial(client, user_id, cid) for cid in channel_ids))
+    allowed = [cid for cid, r in zip(channel_ids, reasons) if r is None]
+    denied = {cid: r for cid, r in zip(channel_ids, reasons) if r is not None}
+    return allowed, denied
+
+class ChannelIdsModal(discord.ui.Modal, title="Salons supplémentaires (IDs)"):
+    ids = discord.ui.TextInput(
+        label="IDs de salons (toutes guildes)", style=discord.TextStyle.paragraph,
+        placeholder="123456789012345678, 234567890123456789 …", required=False, max_length=4000,
+    )
+    def __init__(self, view_ref: "EmbedBuilderView"):
+        super().__init__()
+        self.view_ref = view_ref
+        self.ids.default = ", ".join(str(c) for c in view_ref.extra_channel_ids)
+    async def on_submit(self, itx: discord.Interaction):
+        raw = [x for x in re.split(r"[,;\s]+", str(self.ids)) if x]
+        ids = list(dict.fromkeys(int(x) for x in raw if x.isdigit()))
+        bad = len(raw) - len(ids)
+        await itx.response.defer()  # la résolution des salons/membres peut dépasser 3 s
+        allowed, denied = await filter_allowed_channels(itx.client, itx.user.id, ids)
+        self.view_ref.extra_channel_ids = allowed
+        notice = self.view_ref.targets_line() + (f" · {bad} ID(s) ignoré(s)" if bad else "")
+        if denied:
+            notice += "\n⛔ Refusés : " + ", ".join(f"<#{cid}> ({r})" for cid, r in denied.items())
+        await update_preview(itx, self.view_ref.draft, self.view_ref, notice=notice[:1500])
+
 # --------- Modals ---------
 class TitleDescModal(discord.ui.Modal, title="Titre & Description"):
     titre = discord.ui.TextInput(label="Titre", required=False, max_length=256)
@@ -443,10 +1579,10 @@ class TitleDescModal(discord.ui.Modal, title="Titre & Description"):
         self.description.default = draft.description or ""
         self.url.default = draft.url or ""
     async def on_submit(self, itx: discord.Interaction):
-        self.draft.title = str(self.titre) or None
-        self.draft.description = str(self.description) or None
+        self.draft.title, cut_t = self.draft.clip_text("title", str(self.titre) or None)
+        self.draft.description, cut_d = self.draft.clip_text("description", str(self.description) or None)
         self.draft.url = str(self.url) or None
-        await update_preview(itx, self.draft, self.view_ref)
+        await update_preview(itx, self.draft, self.view_ref, notice=TRUNC_NOTICE if cut_t or cut_d else None)
 
 class ColorModal(discord.ui.Modal, title="Couleur"):
     couleur = discord.ui.TextInput(label="Couleur", placeholder="blue | #5865F2 | ff0044", required=False, max_length=16)
@@ -487,10 +1623,10 @@ class AuthorModal(discord.ui.Modal, title="Author (en-tête)"):
         self.icon.default = draft.author_icon or ""
         self.url.default = draft.author_url or ""
     async def on_submit(self, itx: discord.Interaction):
-        self.draft.author_name = str(self.name) or None
+        self.draft.author_name, cut = self.draft.clip_text("author_name", str(self.name) or None)
         self.draft.author_icon = str(self.icon) or None
         self.draft.author_url = str(self.url) or None
-        await update_preview(itx, self.draft, self.view_ref)
+        await update_preview(itx, self.draft, self.view_ref, notice=TRUNC_NOTICE if cut else None)
 
 class FooterModal(discord.ui.Modal, title="Footer (pied de page)"):
     text = discord.ui.TextInput(label="Texte", required=False, max_length=2048)
@@ -502,9 +1638,9 @@ class FooterModal(discord.ui.Modal, title="Footer (pied de page)"):
         self.text.default = draft.footer_text or ""
         self.icon.default = draft.footer_icon or ""
     async def on_submit(self, itx: discord.Interaction):
-        self.draft.footer_text = str(self.text) or None
+        self.draft.footer_text, cut = self.draft.clip_text("footer_text", str(self.text) or None)
         self.draft.footer_icon = str(self.icon) or None
-        await update_preview(itx, self.draft, self.view_ref)
+        await update_preview(itx, self.draft, self.view_ref, notice=TRUNC_NOTICE if cut else None)
 
 class FieldModal(discord.ui.Modal, title="Ajouter/Éditer un Field"):
     name = discord.ui.TextInput(label="Nom", required=False, max_length=256)
@@ -524,24 +1660,38 @@ class FieldModal(discord.ui.Modal, title="Ajouter/Éditer un Field"):
         n = str(self.name) or "\u200b"
         v = str(self.value) or "\u200b"
         i = (str(self.inline) or "oui").strip().lower() in {"oui", "yes", "true", "1", "y", "o"}
-        if self.index is None:
-            self.draft.fields.append((n, v, i))
+        index = self.index if self.index is not None and 0 <= self.index < len(self.draft.fields) else None
+        if self.index is not None and index is None:
+            await itx.response.send_message("Ce field n'existe plus.", ephemeral=True)
+            return
+        clipped = self.draft.clip_field(n, v, index)
+        if clipped is None:
+            await itx.response.send_message(
+                f"❌ Limite atteinte ({self.draft.budget_line()}). Raccourcis ou supprime un élément.", ephemeral=True)
+            return
+        n, v, cut = clipped
+        if index is None:
+            self.draft.add_field(n, v, i)
         else:
-            if 0 <= self.index < len(self.draft.fields):
-                self.draft.fields[self.index] = (n, v, i)
-        await update_preview(itx, self.draft, self.view_ref)
+            self.draft.set_field(index, n, v, i)
+        await update_preview(itx, self.draft, self.view_ref, notice=TRUNC_NOTICE if cut else None)
+
+_open_builders: dict[int, "EmbedBuilderView"] = {}  # author_id → builder ouvert (pour le snapshot)
+_restored_drafts: dict[int, dict] = {}               # author_id → brouillon d'avant redémarrage
 
 class EmbedBuilderView(discord.ui.View):
     def __init__(self, author_id: int, initial_channel: discord.abc.GuildChannel):
         super().__init__(timeout=600)
         self.author_id = author_id
         self.draft = EmbedDraft()
-        self.target_channel_id = initial_channel.id
+        self.target_channel_ids: list[int] = [initial_channel.id]  # choisis dans le select (guilde courante)
+        self.extra_channel_ids: list[int] = []                     # ajoutés par ID (autres guildes)
+        _open_builders[author_id] = self
 
         # ✅ ChannelSelect (classe) — compatible discord.py 2.4.0
         chan_select = discord.ui.ChannelSelect(
-            placeholder="Choisir le salon de destination",
-            min_values=1, max_values=1,
+            placeholder="Choisir le(s) salon(s) de destination",
+            min_values=1, max_values=25,
             channel_types=[
                 discord.ChannelType.text,
                 discord.ChannelType.public_thread,
@@ -553,16 +1703,38 @@ class EmbedBuilderView(discord.ui.View):
         )
 
         async def _on_select(itx: discord.Interaction):
-            ch = chan_select.values[0]  # Channel choisi
-            if isinstance(ch, (discord.TextChannel, discord.Thread, discord.ForumChannel, discord.VoiceChannel)):
-                self.target_channel_id = ch.id
-                await update_preview(itx, self.draft, self, edit_only=True)
+            # values = AppCommandChannel/AppCommandThread (pas des GuildChannel) → on filtre sur le type
+            sendable = {
+                discord.ChannelType.text, discord.ChannelType.public_thread, discord.ChannelType.private_thread,
+                discord.ChannelType.voice, discord.ChannelType.forum, discord.ChannelType.news,
+            }
+            # ch.permissions = permissions résolues de l'utilisateur qui a fait la sélection
+            ids = [ch.id for ch in chan_select.values
+                   if ch.type in sendable and ch.permissions.send_messages and ch.permissions.embed_links]
+            if ids:
+                self.target_channel_ids = ids
+                await update_preview(itx, self.draft, self, edit_only=True, notice=self.targets_line())
             else:
-                await itx.response.send_message("Salon invalide pour l’envoi.", ephemeral=True)
+                await itx.response.send_message("Salon invalide pour l’envoi (ou permission insuffisante).", ephemeral=True)
 
         chan_select.callback = _on_select  # on attache le callback
         self.add_item(chan_select)
 
+    @property
+    def all_targets(self) -> list[int]:
+        return list(dict.fromkeys(self.target_channel_ids + self.extra_channel_ids))
+
+    def targets_line(self) -> str:
+        return f"🎯 {len(self.all_targets)} salon(s) de destination"
+
+    def close_builder(self):
+        if _open_builders.get(self.author_id) is self:
+            del _open_builders[self.author_id]
+        self.stop()
+
+    async def on_timeout(self):
+        self.close_builder()
+
     async def interaction_check(self, itx: discord.Interaction) -> bool:
         if itx.user.id != self.author_id:
             await itx.response.send_message("Seul l’auteur peut modifier cet embed.", ephemeral=True)
@@ -640,7 +1812,7 @@ class EmbedBuilderView(discord.ui.View):
                 async def select_callback(sel_itx: discord.Interaction):
                     idx = int(select.values[0])
                     if 0 <= idx < len(self.draft.fields):
-                        self.draft.fields.pop(idx)
+                        self.draft.remove_field(idx)
                         await update_preview(sel_itx, self.draft, self.builder_view, edit_only=True)
                         await sel_itx.response.edit_message(content="Field supprimé.", view=None)
                 select.callback = select_callback
@@ -661,31 +1833,207 @@ class EmbedBuilderView(discord.ui.View):
     # --- Ligne 4 : envoyer/annuler
     @discord.ui.button(label="📤 Envoyer", style=discord.ButtonStyle.success, row=4)
     async def btn_send(self, itx: discord.Interaction, _btn: discord.ui.Button):
+        problems = self.draft.validate()
+        if problems:
+            await itx.response.send_message("❌ Embed trop grand : " + " · ".join(problems), ephemeral=True)
+            return
+        targets = self.all_targets
+        self.close_builder()
+        await itx.response.edit_message(content=f"📤 Envoi en cours vers {len(targets)} salon(s)…", embed=None, view=None)
+        # re-vérification au moment de l'envoi (permissions changées, brouillon restauré…)
+        targets, denied = await filter_allowed_channels(itx.client, itx.user.id, targets)
+        results = await send_embed_fanout(itx.client, targets, self.draft.to_embed())
+        results.update({cid: f"refusé : {r}" for cid, r in denied.items()})
+        failed = [cid for cid, r in results.items() if r is not None]
+        if failed:
+            log.warning("[embed] envoi partiel: %d/%d échecs (%s)", len(failed), len(results), failed)
         try:
-            ch = itx.client.get_channel(self.target_channel_id) or await itx.client.fetch_channel(self.target_channel_id)
-            await ch.send(embed=self.draft.to_embed())
-            await itx.response.edit_message(content="✅ Embed envoyé.", embed=None, view=None)
-        except discord.Forbidden:
-            await itx.response.send_message("❌ Permission insuffisante dans ce salon.", ephemeral=True)
+            await itx.edit_original_response(content=fanout_report(results))
         except Exception as e:
-            await itx.response.send_message(f"❌ Erreur à l’envoi : {e}", ephemeral=True)
+            log.warning("[embed] rapport d'envoi impossible: %s", e)
+
+    @discord.ui.button(label="➕ Salons (IDs)", style=discord.ButtonStyle.secondary, row=4)
+    async def btn_more_channels(self, itx: discord.Interaction, _btn: discord.ui.Button):
+        await itx.response.send_modal(ChannelIdsModal(self))
 
     @discord.ui.button(label="🗑️ Annuler", style=discord.ButtonStyle.secondary, row=4)
     async def btn_cancel(self, itx: discord.Interaction, _btn: discord.ui.Button):
+        self.close_builder()
         await itx.response.edit_message(content="❎ Annulé.", embed=None, view=None)
 
 
+# ================== /LOGS — recherche indexée ==================
+_index_cache: dict[str, tuple[float, LogIndex]] = {}  # chemin archive → (mtime du sidecar, index)
+
+def _load_index(seg: Path) -> LogIndex | None:
+    side = f"{seg}.idx"
+    try:
+        mtime = os.path.getmtime(side)
+    except OSError:
+        return None  # pas encore indexé (archivage en cours)
+    cached = _index_cache.get(str(seg))
+    if cached and cached[0] == mtime:
+        return cached[1]
+    idx = LogIndex.load(side)
+    _index_cache[str(seg)] = (mtime, idx)
+    return idx
+
+def parse_time_arg(value: str | None) -> float | None:
+    """'90m', '6h', '3d', '2w' (relatif) ou 'AAAA-MM-JJ[ HH:MM]' (heure locale) → timestamp."""
+    if not value:
+        return None
+    v = value.strip().lower()
+    m = re.fullmatch(r"(\d+)\s*([mhdw])", v)
+    if m:
+        mult = {"m": 60, "h": 3600, "d": 86400, "w": 604800}[m.group(2)]
+        return time.time() - int(m.group(1)) * mult
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(v, fmt))
+        except ValueError:
+            continue
+    raise ValueError(f"date invalide: {value!r}")
+
+def search_logs(log_file: str | Path, *, guild: int | None = None, min_level: str | None = None, logger: str | None = None,
+                user: int | None = None, command: str | None = None, since: float | None = None,
+                until: float | None = None, text: str | None = None,
+                limit: int = LOGS_SEARCH_LIMIT) -> list[tuple[dict, str]]:
+    """Records correspondants, du plus récent au plus ancien (au plus `limit`).
+
+    Le fichier courant est lu directement ; les archives ne sont lues que sur les blocs
+    retenus par leur index, via mmap. Avec `guild`, seuls les records liés à cette guilde sortent
+    (les records sans guilde — démarrage, tracebacks de libs… — sont exclus).
+    """
+    levels = set(LOG_LEVELS[LOG_LEVELS.index(min_level):]) if min_level else None
+    command = command.lstrip("/") if command else None
+    needle = text.lower() if text else None
+    filters = {
+        "level": levels,
+        "logger": {logger} if logger else None,
+        "guild": {str(guild)} if guild else None,
+        "user": {str(user)} if user else None,
+        "command": {command} if command else None,
+    }
+
+    def _matches(rec: dict, raw: str) -> bool:
+        if since is not None and rec["ts"] < since or until is not None and rec["ts"] > until:
+            return False
+        if levels and rec["level"] not in levels:
+            return False
+        if logger and rec["logger"] != logger:
+            return False
+        if guild and rec["guild"] != str(guild):
+            return False
+        if user and rec["user"] != str(user):
+            return False
+        if command and rec["command"] != command:
+            return False
+        return not needle or needle in raw.lower()
+
+    # littéraux nécessaires dans la ligne de tête (formats texte et JSON) → évite de parser le reste
+    groups = []
+    if levels:
+        groups.append([f"| {lvl} |" for lvl in levels] + [f'"level": "{lvl}"' for lvl in levels])
+    if command:
+        groups.append([f" /{command} ", f'"command": "{command}"'])
+    if user:
+        groups.append([str(user)])
+    if guild:
+        groups.append([f" g={guild} ", f'"guild": {guild},'])
+    prefilter = [re.compile("|".join(map(re.escape, g))) for g in groups]
+
+    def _collect(chunk: str) -> list[tuple[dict, str]]:
+        return [hit for hit in iter_log_records(chunk, prefilter) if _matches(*hit)][::-1]
+
+    hits: list[tuple[dict, str]] = []
+    live = Path(log_file)
+    if live.exists():
+        hits.extend(_collect(live.read_text(encoding="utf-8", errors="replace")))
+
+    for seg in reversed(log_segments(log_file)):
+        if len(hits) >= limit:
+            break
+        idx = _load_index(seg)
+        if idx is None or not idx.blocks:
+            continue
+        if since is not None and idx.t_max < since or until is not None and idx.t_min > until:
+            continue
+        blocks = idx.candidates(since, until, **filters)
+        if not blocks:
+            continue
+        with open(seg, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in reversed(blocks):
+                off, length, _, _ = idx.blocks[i]
+                chunk = _decompress_block(mm[off:off + length], idx.compression)
+                hits.extend(_collect(chunk.decode("utf-8", "replace")))
+                if len(hits) >= limit:
+                    break
+    return hits[:limit]
+
+def _file_handler() -> ArchivingFileHandler | None:
+    return next((h for h in logging.getLogger().handlers if isinstance(h, ArchivingFileHandler)), None)
+
+class LogsPageView(discord.ui.View):
+    """Pagination des résultats de /logs (auteur uniquement)."""
+    def __init__(self, author_id: int, hits: list[tuple[dict, str]], summary: str):
+        super().__init__(timeout=600)
+        self.author_id = author_id
+        self.hits = hits
+        self.summary = summary
+        self.page = 0
+        self._sync_buttons()
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-len(self.hits) // LOGS_PAGE_SIZE))
+
+    def _sync_buttons(self):
+        self.btn_prev.disabled = self.page <= 0
+        self.btn_next.disabled = self.page >= self.pages - 1
+
+    def render(self) -> discord.Embed:
+        lines = []
+        for rec, _ in self.hits[self.page * LOGS_PAGE_SIZE:(self.page + 1) * LOGS_PAGE_SIZE]:
+            stamp = time.strftime("%m-%d %H:%M:%S", time.localtime(rec["ts"]))
+            msg = rec["msg"].replace("`", "'").splitlines()[0] if rec["msg"] else ""
+            lines.append(f"{stamp} {rec['level'][:1]} {rec['logger']}: {msg}"[:300])
+        body = "\n".join(lines) or "Aucun résultat."
+        emb = discord.Embed(title="🔎 Logs", description=f"```{body[:4000]}```", color=discord.Color.blurple())
+        emb.set_footer(text=f"Page {self.page + 1}/{self.pages} · {self.summary}")
+        return emb
+
+    async def interaction_check(self, itx: discord.Interaction) -> bool:
+        if itx.user.id != self.author_id:
+            await itx.response.send_message("Seul l’auteur peut paginer ces résultats.", ephemeral=True)
+            return False
+        return True
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def btn_prev(self, itx: discord.Interaction, _btn: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        self._sync_buttons()
+        await itx.response.edit_message(embed=self.render(), view=self)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def btn_next(self, itx: discord.Interaction, _btn: discord.ui.Button):
+        self.page = min(self.pages - 1, self.page + 1)
+        self._sync_buttons()
+        await itx.response.edit_message(embed=self.render(), view=self)
+
 # ================== COMMANDES ==================
 @bot.tree.command(name="ping", description="Renvoie la latence du bot")
+@auto_defer("ping")
 async def ping(interaction: discord.Interaction):
     log_cmd_start(interaction, "ping")
     latency_ms = round(bot.latency * 1000)
     embed = discord.Embed(title="Pong!", description=f"Latence: **{latency_ms} ms**", color=discord.Color.blurple())
+    embed.add_field(name="Auto-defer (defers/appels)", value=defer_stats_line(), inline=False)
     await safe_reply(interaction, embed=embed, ephemeral=True)
     log_cmd_ok(interaction, "ping")
 
 @bot.tree.command(name="hello", description="Dis bonjour (optionnellement à quelqu'un)")
 @app_commands.describe(nom="Nom ou pseudo à saluer (facultatif)")
+@auto_defer("hello", ephemeral=False)
 async def hello(interaction: discord.Interaction, nom: str | None = None):
     log_cmd_start(interaction, "hello")
     cible = nom or interaction.user.display_name
@@ -693,16 +2041,15 @@ async def hello(interaction: discord.Interaction, nom: str | None = None):
     log_cmd_ok(interaction, "hello")
 
 @bot.tree.command(name="invite", description="Affiche le lien d'invitation du bot")
+@auto_defer("invite")
 async def invite(interaction: discord.Interaction):
     log_cmd_start(interaction, "invite")
-    app_info = await bot.application_info()
-    permissions = discord.Permissions(permissions=0)
-    permissions.update(view_channel=True, send_messages=True, embed_links=True, read_message_history=True, use_application_commands=True)
-    invite_url = discord.utils.oauth_url(app_info.id, permissions=permissions, scopes=("bot", "applications.commands"))
+    invite_url = await get_invite_url()
     await safe_reply(interaction, f"Voici mon lien d'invitation : {invite_url}")
     log_cmd_ok(interaction, "invite")
 
 @bot.tree.command(name="vc_test", description="Test de connexion vocale (diagnostic)")
+@auto_defer("vc_test", ephemeral=False)
 async def vc_test(interaction: discord.Interaction):
     log_cmd_start(interaction, "vc_test")
     vc = await ensure_connected_to_user_vc(interaction)
@@ -711,6 +2058,7 @@ async def vc_test(interaction: discord.Interaction):
         log_cmd_ok(interaction, "vc_test")
 
 @bot.tree.command(name="join", description="Fait venir le bot dans ton salon vocal")
+@auto_defer("join", ephemeral=False)
 async def join(interaction: discord.Interaction):
     log_cmd_start(interaction, "join")
     vc = await ensure_connected_to_user_vc(interaction)
@@ -719,10 +2067,12 @@ async def join(interaction: discord.Interaction):
         log_cmd_ok(interaction, "join")
 
 @bot.tree.command(name="leave", description="Fait quitter le salon vocal au bot")
+@auto_defer("leave")
 async def leave(interaction: discord.Interaction):
     log_cmd_start(interaction, "leave")
     vc: discord.VoiceClient | None = interaction.guild.voice_client
     if vc and vc.is_connected():
+        forget_playback(interaction.guild.id)
         await vc.disconnect()
         await safe_reply(interaction, "J'ai quitté le salon vocal 👋", ephemeral=True)
         log_cmd_ok(interaction, "leave")
@@ -730,32 +2080,40 @@ async def leave(interaction: discord.Interaction):
         await safe_reply(interaction, "Je ne suis pas dans un salon vocal.", ephemeral=True)
 
 @bot.tree.command(name="pause", description="Met la musique en pause")
+@auto_defer("pause")
 async def pause(interaction: discord.Interaction):
     log_cmd_start(interaction, "pause")
     vc: discord.VoiceClient | None = interaction.guild.voice_client
     if vc and vc.is_playing():
         vc.pause()
+        if pb := _playback.get(interaction.guild.id):
+            pb.pause()
         await safe_reply(interaction, "⏸️ Pause.", ephemeral=True)
         log_cmd_ok(interaction, "pause")
     else:
         await safe_reply(interaction, "Rien n'est en cours de lecture.", ephemeral=True)
 
 @bot.tree.command(name="resume", description="Relance la musique")
+@auto_defer("resume")
 async def resume(interaction: discord.Interaction):
     log_cmd_start(interaction, "resume")
     vc: discord.VoiceClient | None = interaction.guild.voice_client
     if vc and vc.is_paused():
         vc.resume()
+        if pb := _playback.get(interaction.guild.id):
+            pb.resume()
         await safe_reply(interaction, "▶️ Reprise.", ephemeral=True)
         log_cmd_ok(interaction, "resume")
     else:
         await safe_reply(interaction, "Rien n'est en pause.", ephemeral=True)
 
 @bot.tree.command(name="stop", description="Arrête la musique")
+@auto_defer("stop")
 async def stop(interaction: discord.Interaction):
     log_cmd_start(interaction, "stop")
     vc: discord.VoiceClient | None = interaction.guild.voice_client
     if vc and (vc.is_playing() or vc.is_paused()):
+        forget_playback(interaction.guild.id)
         vc.stop()
         await safe_reply(interaction, "⏹️ Musique arrêtée.", ephemeral=True)
         log_cmd_ok(interaction, "stop")
@@ -764,6 +2122,7 @@ async def stop(interaction: discord.Interaction):
 
 @bot.tree.command(name="play", description="Lire une musique depuis un lien ou une recherche (YouTube, etc.)")
 @app_commands.describe(query="Lien (YouTube/… ) ou recherche (ex: 'artist - title')")
+@auto_defer("play", ephemeral=False)
 async def play(interaction: discord.Interaction, query: str):
     log_cmd_start(interaction, "play")
     vc = await ensure_connected_to_user_vc(interaction)
@@ -775,27 +2134,25 @@ async def play(interaction: discord.Interaction, query: str):
         return
 
     if vc.is_playing() or vc.is_paused():
+        forget_playback(interaction.guild.id)
         vc.stop()
 
     try:
-        with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
-            info = ydl.extract_info(query, download=False)
-            if "entries" in info:
-                info = next((e for e in info["entries"] if e), None)
-            if not info:
-                await safe_reply(interaction, "Aucun résultat trouvé.")
-                return
+        info = await asyncio.to_thread(extract_track, query)  # ne bloque plus la boucle pendant l'extraction
+        if not info:
+            await safe_reply(interaction, "Aucun résultat trouvé.")
+            return
 
-            title = info.get("title", "Inconnu")
-            url = info.get("webpage_url", query)
-            stream_url = info.get("url")
+        title = info.get("title", "Inconnu")
+        url = info.get("webpage_url", query)
+        stream_url = info.get("url")
+        duration = info.get("duration")
 
         if not stream_url:
             await safe_reply(interaction, "Impossible d'obtenir le flux audio.")
             return
 
-        source = build_ffmpeg_source(stream_url)
-        vc.play(source, after=lambda e: log.info("[PLAY] terminé: %s", e) if e else log.info("[PLAY] terminé."))
+        start_playback(vc, Playback(interaction.guild.id, vc.channel.id, title, url, stream_url, duration))
         embed = discord.Embed(title="Lecture en cours 🎵", description=f"**{title}**", color=discord.Color.green())
         embed.add_field(name="Source", value=url, inline=False)
         await safe_reply(interaction, embed=embed, ephemeral=False)
@@ -808,16 +2165,22 @@ async def play(interaction: discord.Interaction, query: str):
 # ---- EMBED BUILDER command ----
 @bot.tree.command(name="embed", description="Constructeur d'embed 100% custom (preview + envoi)")
 @app_commands.describe(channel="Salon de destination (défaut: ici)")
+@auto_defer("embed")
 async def embed_cmd(interaction: discord.Interaction, channel: discord.TextChannel | None = None):
     log_cmd_start(interaction, "embed")
     target = channel or interaction.channel
     perms = target.permissions_for(interaction.guild.me if interaction.guild else interaction.user)
     if not perms.send_messages or not perms.embed_links:
-        await interaction.response.send_message("❌ Je n’ai pas la permission d’envoyer des **embeds** dans ce salon.", ephemeral=True)
+        await safe_reply(interaction, "❌ Je n’ai pas la permission d’envoyer des **embeds** dans ce salon.")
         return
     view = EmbedBuilderView(author_id=interaction.user.id, initial_channel=target)
+    header = "**Aperçu** — configure via les boutons ci-dessous :"
+    if saved := _restored_drafts.pop(interaction.user.id, None):
+        view.draft = EmbedDraft.from_dict(saved["draft"])
+        view.extra_channel_ids = saved.get("extra_channel_ids", [])
+        header = "**Aperçu** — brouillon restauré après redémarrage :"
     emb = view.draft.to_embed()
-    await interaction.response.send_message(content="**Aperçu** — configure via les boutons ci-dessous :", embed=emb, view=view, ephemeral=True)
+    await safe_reply(interaction, preview_content(view.draft, header), embed=emb, view=view)
     log_cmd_ok(interaction, "embed")
 
 @bot.tree.command(name="live", description="Force l'état du live ON/OFF (TikTok)")
@@ -826,12 +2189,59 @@ async def embed_cmd(interaction: discord.Interaction, channel: discord.TextChann
     app_commands.Choice(name="ON", value="on"),
     app_commands.Choice(name="OFF", value="off"),
 ])
+@auto_defer("live")
 async def live(interaction: discord.Interaction, state: app_commands.Choice[str]):
     log_cmd_start(interaction, "live")
     await safe_reply(interaction, f"Bascule LIVE → **{state.name}**", ephemeral=True)
     await set_live_channel_name(state.value == "on")
     log_cmd_ok(interaction, "live")
 
+@bot.tree.command(name="logs", description="Recherche dans les logs du bot (admin)")
+@app_commands.default_permissions(administrator=True)
+@app_commands.guild_only()
+@app_commands.describe(
+    level="Niveau minimum",
+    logger="Nom du logger (ex: bot, discord)",
+    user="Utilisateur concerné",
+    command="Nom de la commande (ex: play)",
+    since="Début : 30m, 6h, 3d, 2w ou AAAA-MM-JJ[ HH:MM] (défaut: 24h si aucune borne)",
+    until="Fin (même format, défaut: maintenant)",
+    texte="Texte contenu dans la ligne",
+)
+@app_commands.choices(level=[app_commands.Choice(name=lvl, value=lvl) for lvl in LOG_LEVELS])
+@auto_defer("logs")
+async def logs_cmd(interaction: discord.Interaction, level: app_commands.Choice[str] | None = None,
+                   logger: str | None = None, user: discord.User | None = None, command: str | None = None,
+                   since: str | None = None, until: str | None = None, texte: str | None = None):
+    log_cmd_start(interaction, "logs")
+    fh = _file_handler()
+    if fh is None:
+        await safe_reply(interaction, "Aucun fichier de log configuré.")
+        return
+    try:
+        # défaut : dernières 24 h, seulement si aucune borne n'est donnée (sinon until < since)
+        t_since, t_until = parse_time_arg(since or (None if until else "24h")), parse_time_arg(until)
+    except ValueError as e:
+        await safe_reply(interaction, f"❌ {e}")
+        return
+    if t_since is not None and t_until is not None and t_since > t_until:
+        await safe_reply(interaction, "❌ `since` est après `until`.")
+        return
+    await defer_once(interaction)
+    # admin d'un serveur → seulement les logs de ce serveur ; le propriétaire du bot voit tout
+    scope = None if await bot.is_owner(interaction.user) else interaction.guild.id
+    t0 = time.perf_counter()
+    hits = await asyncio.to_thread(
+        search_logs, fh.baseFilename, guild=scope, min_level=level.value if level else None, logger=logger,
+        user=user.id if user else None, command=command, since=t_since, until=t_until, text=texte,
+    )
+    elapsed = (time.perf_counter() - t0) * 1000
+    summary = (f"{len(hits)} résultat(s){'+' if len(hits) >= LOGS_SEARCH_LIMIT else ''} en {elapsed:.0f} ms"
+               f" · {'toutes guildes' if scope is None else 'ce serveur'}")
+    view = LogsPageView(interaction.user.id, hits, summary)
+    await interaction.followup.send(embed=view.render(), view=view, ephemeral=True)
+    log_cmd_ok(interaction, "logs")
+
 # ================== LANCEMENT ==================
 def main():
     if not TOKEN:
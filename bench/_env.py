@@ -0,0 +1,10 @@
+"""À importer avant `app` : logs et snapshot dans un dossier temporaire, app.py importable."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+_tmp = tempfile.mkdtemp(prefix="bot-bench-")
+os.environ.setdefault("LOG_FILE", str(Path(_tmp) / "bot.log"))
+os.environ.setdefault("STATE_FILE", str(Path(_tmp) / "snapshot.json"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,107 @@
+"""Débit de send_embed_fanout contre un faux client HTTP local (latence + 429 simulés).
+
+    python bench/bench_fanout.py --channels 60 --latency 0.05 --rate 40 --p429 0.1
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+import _env  # noqa: F401  (avant app : LOG_FILE/STATE_FILE temporaires)
+import discord
+
+import app
+
+
+def fake_response(status: int, reason: str, headers: dict | None = None):
+    return SimpleNamespace(status=status, reason=reason, headers=headers or {})
+
+
+class FakeChannel:
+    def __init__(self, cid: int, client: "FakeClient"):
+        self.id = cid
+        self.client = client
+        self.throttled = False
+
+    async def send(self, embed=None):
+        c = self.client
+        c.requests += 1
+        c.in_flight += 1
+        c.max_in_flight = max(c.max_in_flight, c.in_flight)
+        try:
+            await asyncio.sleep(c.latency)
+            if self.id in c.forbidden:
+                raise discord.Forbidden(fake_response(403, "Forbidden"), "Missing Permissions")
+            if not self.throttled and c.rng.random() < c.p429:
+                self.throttled = True
+                c.throttles += 1
+                headers = {"Retry-After": str(c.retry_after), "X-RateLimit-Global": "false"}
+                raise discord.HTTPException(fake_response(429, "Too Many Requests", headers), "rate limited")
+            c.delivered.append(self.id)
+        finally:
+            c.in_flight -= 1
+
+
+class FakeClient:
+    def __init__(self, n: int, latency: float, p429: float, retry_after: float, forbidden: set[int], seed: int):
+        self.latency = latency
+        self.p429 = p429
+        self.retry_after = retry_after
+        self.forbidden = forbidden
+        self.rng = random.Random(seed)
+        self.channels = {cid: FakeChannel(cid, self) for cid in range(1, n + 1)}
+        self.requests = self.throttles = self.in_flight = self.max_in_flight = 0
+        self.delivered: list[int] = []
+
+    def get_channel(self, cid: int):
+        return self.channels.get(cid)
+
+    async def fetch_channel(self, cid: int):
+        raise discord.NotFound(fake_response(404, "Not Found"), "Unknown Channel")
+
+
+async def run(args) -> int:
+    client = FakeClient(args.channels, args.latency, args.p429, args.retry_after, {13}, args.seed)
+    bucket = app.RateBucket(args.rate)
+    ids = list(client.channels) + [10**9]  # un salon inconnu
+    t0 = time.perf_counter()
+    results = await app.send_embed_fanout(client, ids, discord.Embed(title="bench"), bucket=bucket)
+    dt = time.perf_counter() - t0
+
+    ok = sum(1 for r in results.values() if r is None)
+    print(f"salons={len(ids)} ok={ok} échecs={len(ids) - ok} requêtes={client.requests} 429={client.throttles}")
+    print(f"durée={dt:.3f}s débit={client.requests / dt:.1f} req/s "
+          f"(bucket {args.rate}/s, rafale {bucket.capacity:.0f}) max_en_vol={client.max_in_flight}")
+    print(app.fanout_report(results))
+
+    # garde-fous de régression
+    expected_fail = {13: "permission insuffisante", 10**9: "salon introuvable"}
+    errors = []
+    if {cid: r for cid, r in results.items() if r is not None} != expected_fail:
+        errors.append("échecs inattendus")
+    if sorted(client.delivered) != [cid for cid in client.channels if cid != 13]:
+        errors.append("livraisons manquantes ou en double")
+    if client.max_in_flight > app.FANOUT_CONCURRENCY:
+        errors.append("concurrence dépassée")
+    if client.requests > bucket.capacity + args.rate * dt + 1:
+        errors.append("bucket global dépassé")
+    for e in errors:
+        print("ÉCHEC:", e)
+    return 1 if errors else 0
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--channels", type=int, default=60)
+    p.add_argument("--latency", type=float, default=0.05, help="latence simulée par requête (s)")
+    p.add_argument("--rate", type=float, default=app.FANOUT_GLOBAL_RATE, help="bucket global (req/s)")
+    p.add_argument("--p429", type=float, default=0.1, help="probabilité d'un 429 au 1er envoi d'un salon")
+    p.add_argument("--retry-after", type=float, default=0.2)
+    p.add_argument("--seed", type=int, default=0)
+    sys.exit(asyncio.run(run(p.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
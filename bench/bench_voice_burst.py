@@ -0,0 +1,107 @@
+"""Rafale vocale rejouée : coût par événement sur la boucle, ancien chemin vs VoiceEventCoalescer.
+
+    python bench/bench_voice_burst.py --members 2000
+
+Chaque membre est déplacé #A → #B puis server-mute (2 événements par membre), comme un
+« déplacer tout le monde » suivi d'un mute de salon. L'ancien chemin loggait chaque événement
+directement dans le log principal depuis le handler ; le nouveau ne fait que describe + add
+sur la boucle, puis un flush (résumé + écriture JSON dans un thread).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import _env  # noqa: F401  (avant app : LOG_FILE/STATE_FILE temporaires)
+import app
+
+GUILD_ID = 1
+
+
+class CountingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def voice_state(channel, mute=False):
+    return SimpleNamespace(channel=channel, self_mute=False, self_deaf=False, mute=mute, deaf=False,
+                           self_stream=False, self_video=False)
+
+
+def burst(n: int) -> list[tuple]:
+    """(member, before, after) : n déplacements #A → #B puis n server-mute dans #B."""
+    guild = SimpleNamespace(id=GUILD_ID)
+    a, b = SimpleNamespace(id=100, name="A"), SimpleNamespace(id=200, name="B")
+    members = [SimpleNamespace(id=1000 + i, bot=False, guild=guild, display_name=f"membre{i}") for i in range(n)]
+    moves = [(m, voice_state(a), voice_state(b)) for m in members]
+    mutes = [(m, voice_state(b), voice_state(b, mute=True)) for m in members]
+    return moves + mutes
+
+
+def legacy_handler(member, before, after):
+    """Ancien on_voice_state_update : une ligne du log principal par événement, sur la boucle."""
+    for ev in app.describe_voice_change(member, before, after):
+        app.log.log(ev.level, ev.fmt, *ev.args, extra=ev.extra())
+
+
+async def run(args) -> int:
+    # la console reste formatée (coût réel) mais part dans /dev/null pour garder la sortie lisible
+    devnull = open(os.devnull, "w")
+    for h in logging.getLogger().handlers:
+        if type(h) is logging.StreamHandler:
+            h.setStream(devnull)
+    main_lines, records = CountingHandler(), CountingHandler()
+    app.log.addHandler(main_lines)
+    app.voice_events_log.addHandler(records)
+    events = burst(args.members)
+    n_events = len(events)
+
+    t0 = time.perf_counter()
+    for e in events:
+        legacy_handler(*e)
+    legacy_us = (time.perf_counter() - t0) / n_events * 1e6
+    legacy_lines, main_lines.count = main_lines.count, 0
+
+    coalescer = app.VoiceEventCoalescer(window=3600, threshold=app.VOICE_BURST_THRESHOLD)  # flush manuel
+    t0 = time.perf_counter()
+    for member, before, after in events:
+        coalescer.add(member.guild.id, app.describe_voice_change(member, before, after))
+    new_us = (time.perf_counter() - t0) / n_events * 1e6
+    t0 = time.perf_counter()
+    coalescer.flush(GUILD_ID)
+    flush_ms = (time.perf_counter() - t0) * 1e3
+    await asyncio.get_running_loop().shutdown_default_executor()  # attend l'écriture JSON
+
+    print(f"événements={n_events} ({args.members} membres × déplacement + server-mute)")
+    print(f"ancien : {legacy_us:.1f} µs/événement sur la boucle, {legacy_lines} lignes dans le log principal")
+    print(f"nouveau: {new_us:.1f} µs/événement sur la boucle + flush {flush_ms:.1f} ms, "
+          f"{main_lines.count} lignes dans le log principal, {records.count} enregistrements JSON")
+
+    # garde-fous de régression
+    errors = []
+    if records.count != n_events:
+        errors.append("enregistrements JSON manquants")
+    if main_lines.count != 2:
+        errors.append("résumé attendu : 2 lignes (déplacement + mute)")
+    if new_us + flush_ms * 1e3 / n_events > legacy_us:
+        errors.append("nouveau chemin plus lent que l'ancien")
+    for e in errors:
+        print("ÉCHEC:", e)
+    return 1 if errors else 0
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--members", type=int, default=2000)
+    sys.exit(asyncio.run(run(p.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
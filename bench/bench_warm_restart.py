@@ -0,0 +1,110 @@
+"""Délai redémarrage → musique : démarrage à froid (/play) vs restauration du snapshot.
+
+    python bench/bench_warm_restart.py --connect 0.3 --extract 1.5
+
+Connexion vocale et extraction yt-dlp sont simulées avec des latences fixes. Le démarrage à
+froid refait ce que fait /play (connexion + extraction + lecture depuis 0) ; la restauration
+passe par _restore_voice, avec une URL de flux encore valide puis expirée (ré-extraction).
+La position relancée doit rester celle du snapshot, quel que soit le temps de reprise.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+
+import _env  # noqa: F401  (avant app : LOG_FILE/STATE_FILE temporaires)
+import app
+
+GUILD_ID, CHANNEL_ID, POSITION = 1, 10, 42.0
+
+
+class FakeVC:
+    def __init__(self, channel):
+        self.channel = channel
+        self.started: tuple[str, float] | None = None  # (stream_url, -ss)
+        self.started_at: float | None = None
+
+    def is_connected(self):
+        return True
+
+    def play(self, source, after=None):
+        self.started, self.started_at = source, time.perf_counter()
+
+    def pause(self):
+        pass
+
+
+def setup(args) -> SimpleNamespace:
+    guild = SimpleNamespace(id=GUILD_ID, voice_client=None)
+    channel = SimpleNamespace(id=CHANNEL_ID, guild=guild)
+
+    async def connect(**kwargs):
+        await asyncio.sleep(args.connect)
+        guild.voice_client = FakeVC(channel)
+        return guild.voice_client
+
+    def extract(query):
+        time.sleep(args.extract)
+        return {"title": "t", "webpage_url": "p", "url": "s", "duration": 300}
+
+    channel.connect = connect
+    app.bot.get_channel = lambda cid: channel if cid == CHANNEL_ID else None
+    app.build_ffmpeg_source = lambda url, start=0.0: (url, start)
+    app.extract_track = extract
+    app.yt_dlp = object()  # la restauration ne ré-extrait que si yt-dlp est présent
+    return channel
+
+
+async def cold(channel) -> tuple[float, FakeVC]:
+    t0 = time.perf_counter()
+    vc = await channel.connect(self_deaf=True)
+    info = await asyncio.to_thread(app.extract_track, "query")
+    app.start_playback(vc, app.Playback(GUILD_ID, CHANNEL_ID, info["title"], info["webpage_url"], info["url"],
+                                        info["duration"]))
+    return vc.started_at - t0, vc
+
+
+async def warm(channel, *, stale: bool) -> tuple[float, FakeVC]:
+    data = app.Playback(GUILD_ID, CHANNEL_ID, "t", "p", "s", duration=300).to_dict()
+    data["position"] = POSITION
+    data["extracted_at"] = time.time() - (app.STREAM_URL_TTL + 1 if stale else 60)
+    channel.guild.voice_client = None
+    t0 = time.perf_counter()
+    await app._restore_voice({"channel_id": CHANNEL_ID, "playback": data})
+    vc = channel.guild.voice_client
+    return vc.started_at - t0, vc
+
+
+async def run(args) -> int:
+    channel = setup(args)
+    t_cold, _ = await cold(channel)
+    t_warm, vc_warm = await warm(channel, stale=False)
+    t_stale, vc_stale = await warm(channel, stale=True)
+    print(f"connexion={args.connect:.2f}s extraction={args.extract:.2f}s")
+    print(f"à froid (/play)         : musique après {t_cold:.3f}s, depuis 0 s")
+    print(f"snapshot, URL valide    : musique après {t_warm:.3f}s, à {vc_warm.started[1]:.2f} s")
+    print(f"snapshot, URL expirée   : musique après {t_stale:.3f}s, à {vc_stale.started[1]:.2f} s")
+
+    # garde-fous de régression
+    errors = []
+    if vc_warm.started[1] != POSITION or vc_stale.started[1] != POSITION:
+        errors.append("position restaurée ≠ position du snapshot")
+    if t_warm > args.connect + 0.1:
+        errors.append("restauration plus lente que la seule connexion")
+    if t_warm >= t_cold:
+        errors.append("restauration pas plus rapide qu'un démarrage à froid")
+    for e in errors:
+        print("ÉCHEC:", e)
+    return 1 if errors else 0
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--connect", type=float, default=0.3, help="latence simulée de la connexion vocale (s)")
+    p.add_argument("--extract", type=float, default=1.5, help="latence simulée de l'extraction yt-dlp (s)")
+    sys.exit(asyncio.run(run(p.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+"""Environnement commun aux tests : logs et snapshot dans un dossier temporaire, app.py importable."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+try:
+    import discord  # noqa: F401
+except ImportError:
+    collect_ignore_glob = ["test_*.py"]  # app.py importe discord.py au chargement
+
+_tmp = tempfile.mkdtemp(prefix="bot-tests-")
+os.environ.setdefault("LOG_FILE", str(Path(_tmp) / "bot.log"))
+os.environ.setdefault("STATE_FILE", str(Path(_tmp) / "snapshot.json"))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
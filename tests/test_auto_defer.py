@@ -0,0 +1,73 @@
+"""auto_defer contre un handler qui répond pendant que le defer est encore en vol."""
+import asyncio
+import datetime as dt
+from types import SimpleNamespace
+
+import app
+
+
+class FakeResponse:
+    """is_done() ne passe à True qu'après la « requête HTTP », comme discord.py."""
+    def __init__(self, calls: list, latency: float):
+        self.calls = calls
+        self.latency = latency
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def _respond(self, kind):
+        if self._done:
+            raise AssertionError("interaction déjà acquittée (40060)")
+        self.calls.append(kind)
+        await asyncio.sleep(self.latency)
+        self._done = True
+
+    async def defer(self, **kwargs):
+        await self._respond("defer")
+
+    async def send_message(self, *args, **kwargs):
+        await self._respond("send_message")
+
+
+class FakeFollowup:
+    def __init__(self, calls: list):
+        self.calls = calls
+
+    async def send(self, *args, **kwargs):
+        self.calls.append("followup")
+
+
+def fake_interaction(age: float = 0.0, latency: float = 0.1):
+    calls: list[str] = []
+    created = dt.datetime.now(dt.timezone.utc) - dt.timedelta(seconds=age)
+    return SimpleNamespace(id=1, created_at=created, extras={}, calls=calls,
+                           response=FakeResponse(calls, latency), followup=FakeFollowup(calls))
+
+
+def test_reply_racing_the_defer_goes_to_followup(monkeypatch):
+    monkeypatch.setattr(app, "AUTO_DEFER_AFTER", 0.05)
+    monkeypatch.setattr(app, "_cmd_extra", lambda *a, **k: {})
+
+    @app.auto_defer("race")
+    async def handler(interaction):
+        await asyncio.sleep(0.07)  # répond alors que le defer (0.1 s) est en vol
+        await app.safe_reply(interaction, "ok")
+
+    itx = fake_interaction()
+    asyncio.run(handler(itx))
+    assert itx.calls == ["defer", "followup"]
+
+
+def test_budget_counts_from_interaction_creation(monkeypatch):
+    monkeypatch.setattr(app, "AUTO_DEFER_AFTER", 2.0)
+    monkeypatch.setattr(app, "_cmd_extra", lambda *a, **k: {})
+
+    @app.auto_defer("late")
+    async def handler(interaction):
+        await asyncio.sleep(0.3)
+        await app.safe_reply(interaction, "ok")
+
+    itx = fake_interaction(age=1.9, latency=0.0)  # déjà 1.9 s de file d'attente
+    asyncio.run(handler(itx))
+    assert itx.calls == ["defer", "followup"]
@@ -0,0 +1,57 @@
+"""Propriétés du compteur de taille d'EmbedDraft sur des brouillons aléatoires."""
+import random
+
+import app
+
+
+def recomputed_chars(draft: app.EmbedDraft) -> int:
+    total = sum(len(getattr(draft, attr) or "") for attr in app.EMBED_TEXT_LIMITS)
+    return total + sum(app._field_len(n, v) for n, v, _ in draft.fields)
+
+
+def random_edit(rng: random.Random, draft: app.EmbedDraft):
+    r = rng.random()
+    if r < 0.4:
+        attr = rng.choice(list(app.EMBED_TEXT_LIMITS))
+        value, _ = draft.clip_text(attr, "x" * rng.randint(0, 5000) or None)
+        setattr(draft, attr, value)
+    elif r < 0.8:
+        index = rng.choice([None, *range(len(draft.fields))])
+        clipped = draft.clip_field("n" * rng.randint(0, 300), "v" * rng.randint(0, 1100), index)
+        if clipped:
+            name, value, _ = clipped
+            if index is None:
+                draft.add_field(name, value, rng.random() < 0.5)
+            else:
+                draft.set_field(index, name, value, rng.random() < 0.5)
+    elif draft.fields:
+        draft.remove_field(rng.randrange(len(draft.fields)))
+
+
+def test_running_total_matches_and_draft_stays_valid():
+    for seed in range(3000):
+        rng = random.Random(seed)
+        draft = app.EmbedDraft()
+        for _ in range(60):
+            random_edit(rng, draft)
+            assert draft.chars == recomputed_chars(draft), seed
+            assert draft.validate() == [], seed
+            assert draft.remaining >= 0, seed
+            assert len(draft.fields) <= app.EMBED_MAX_FIELDS, seed
+
+
+def test_validate_cache_invalidated_on_mutation():
+    draft = app.EmbedDraft()
+    assert draft.validate() == []
+    draft.description = "x" * (app.EMBED_TEXT_LIMITS["description"] + 1)
+    assert draft.validate()
+    draft.description = None
+    assert draft.validate() == []
+
+
+def test_round_trip_keeps_no_color():
+    draft = app.EmbedDraft()
+    draft.color = None
+    assert app.EmbedDraft.from_dict(draft.to_dict()).color is None
+    draft.color = app.discord.Color(0x123456)
+    assert app.EmbedDraft.from_dict(draft.to_dict()).color.value == 0x123456
@@ -0,0 +1,38 @@
+"""send_embed_fanout : le bucket global est partagé entre envois simultanés."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import discord
+
+import app
+
+
+class FakeClient:
+    def __init__(self, n: int):
+        self.sent: list[float] = []
+        self.channels = {cid: SimpleNamespace(id=cid, send=self._send) for cid in range(1, n + 1)}
+
+    async def _send(self, embed=None):
+        self.sent.append(time.monotonic())
+
+    def get_channel(self, cid):
+        return self.channels.get(cid)
+
+
+def test_concurrent_fanouts_share_the_global_bucket(monkeypatch):
+    rate = 20.0
+    monkeypatch.setattr(app, "fanout_bucket", app.RateBucket(rate))
+    client = FakeClient(15)
+
+    async def two_builders():
+        embed = discord.Embed(title="t")
+        ids = list(client.channels)
+        t0 = time.monotonic()
+        await asyncio.gather(app.send_embed_fanout(client, ids, embed), app.send_embed_fanout(client, ids, embed))
+        return time.monotonic() - t0
+
+    dt = asyncio.run(two_builders())
+    assert len(client.sent) == 30
+    # 30 envois, rafale de 20 puis 20/s : au moins 0.5 s si le bucket est bien partagé
+    assert dt >= (30 - rate) / rate * 0.9
@@ -0,0 +1,114 @@
+"""Index sidecar des logs archivés et recherche /logs."""
+import io
+import logging
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+import app
+
+USER = 123456789012345678
+
+
+def text_line(ts: float, level: str, msg: str) -> str:
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+    return f"{stamp} | {level} | bot | app.py:1 | {msg}\n"
+
+
+def wait_for(path: Path, timeout: float = 5.0):
+    deadline = time.time() + timeout
+    while not path.exists():
+        assert time.time() < deadline, f"{path} jamais créé"
+        time.sleep(0.02)
+
+
+def test_legacy_zstd_archive_is_indexed_and_searchable(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    now = time.time()
+    body = "".join(text_line(now - 60, "INFO", f"▶️ /play par x#0({USER}) @ g / c") for _ in range(50))
+    legacy = tmp_path / "bot.log.20260101-000000.zst"
+    dst = io.BytesIO()
+    zstandard.ZstdCompressor(level=10).copy_stream(io.BytesIO(body.encode()), dst)  # sans taille de contenu
+    legacy.write_bytes(dst.getvalue())
+
+    handler = app.ArchivingFileHandler(str(tmp_path / "bot.log"), 1 << 20, "zstd", 30, 0)
+    try:
+        wait_for(Path(f"{legacy}.idx"))
+    finally:
+        handler.close()
+    hits = app.search_logs(tmp_path / "bot.log", user=USER, since=now - 3600)
+    assert len(hits) == 50
+    assert all(rec["command"] == "play" for rec, _ in hits)
+
+
+def test_search_is_scoped_to_guild(tmp_path):
+    now = time.time()
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now - 60))
+    lines = [
+        f"{stamp} | INFO | bot | app.py:1 g=111 | ▶️ /play par a#0({USER}) @ A / c\n",
+        f"{stamp} | INFO | bot | app.py:1 g=222 | ▶️ /play par b#0({USER}) @ B / c\n",
+        f"{stamp} | ERROR | bot | app.py:1 | Traceback sans guilde\n",
+        '{"ts": "%s", "level": "INFO", "logger": "bot", "guild": 222, "user": %d, "command": "play", '
+        '"event": "cmd_ok", "duration_ms": 1.0, "msg": "json B"}\n'
+        % (time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(now - 30)), USER),
+    ]
+    segment = tmp_path / "bot.log.20260101-000000"
+    segment.write_text("".join(lines), encoding="utf-8")
+    (tmp_path / "bot.log").write_text(lines[0], encoding="utf-8")
+
+    handler = app.ArchivingFileHandler(str(tmp_path / "bot.log"), 1 << 20, "gzip", 30, 0)
+    try:
+        wait_for(Path(f"{segment}.gz.idx"))
+    finally:
+        handler.close()
+
+    def msgs(**kw):
+        return sorted(rec["msg"] for rec, _ in app.search_logs(tmp_path / "bot.log", since=now - 3600, **kw))
+
+    assert msgs(guild=222) == ["json B", "▶️ /play par b#0(%d) @ B / c" % USER]
+    assert len(msgs(guild=111)) == 2  # archive + fichier courant
+    assert all("Traceback" not in m for m in msgs(guild=111) + msgs(guild=222))
+    assert len(msgs()) == 5  # sans scope (propriétaire du bot)
+
+
+def test_guild_tag_filter_formats_text_lines():
+    fmt = logging.Formatter("%(filename)s:%(lineno)d%(guild_tag)s | %(message)s")
+    flt = app.GuildTagFilter()
+    rec = logging.LogRecord("bot", logging.INFO, "app.py", 7, "m", None, None)
+    rec.guild = 42
+    flt.filter(rec)
+    assert fmt.format(rec) == "app.py:7 g=42 | m"
+    bare = logging.LogRecord("bot", logging.INFO, "app.py", 7, "m", None, None)
+    flt.filter(bare)
+    assert fmt.format(bare) == "app.py:7 | m"
+
+
+
+def test_prune_counts_archives_from_another_compression(tmp_path):
+    """Changement de LOG_COMPRESSION : les archives de l'ancien format restent soumises à la rétention."""
+    pytest.importorskip("zstandard")
+
+    def archive(name: str, age_days: float) -> Path:
+        seg = tmp_path / name
+        seg.write_bytes(b"x" * 100)
+        Path(f"{seg}.idx").write_text('{"v": %d}' % app.LOG_INDEX_VERSION)
+        t = time.time() - age_days * 86400
+        os.utime(seg, (t, t))
+        return seg
+
+    def run(compression: str, retention_bytes: int):
+        handler = app.ArchivingFileHandler(str(tmp_path / "bot.log"), 1 << 20, compression, 30, retention_bytes)
+        handler.close()  # None après la purge initiale : le worker s'arrête
+        handler._worker.join(5)
+
+    stale = [archive("bot.log.20260101-000000.gz", 40)]
+    recent_gz = archive("bot.log.20260201-000000.gz", 2)
+    recent_zst = archive("bot.log.20260202-000000.zst", 1)
+    run("zstd", 0)  # purge par âge
+    assert not any(p.exists() or Path(f"{p}.idx").exists() for p in stale)
+    assert recent_gz.exists() and recent_zst.exists()
+
+    run("zstd", 150)  # purge par taille : le .gz compte dans le total, le plus ancien part
+    assert not recent_gz.exists() and recent_zst.exists()
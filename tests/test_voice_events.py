@@ -0,0 +1,64 @@
+"""Rafales vocales : les enregistrements différés gardent l'heure de l'événement."""
+import asyncio
+import json
+import logging
+import time
+from types import SimpleNamespace
+
+import app
+
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def moves(n: int, guild_id: int = 1):
+    guild = SimpleNamespace(id=guild_id)
+    a, b = SimpleNamespace(id=100, name="A"), SimpleNamespace(id=200, name="B")
+    state = dict(self_mute=False, self_deaf=False, mute=False, deaf=False, self_stream=False, self_video=False)
+    for i in range(n):
+        member = SimpleNamespace(id=1000 + i, guild=guild, display_name=f"m{i}")
+        yield app.describe_voice_change(member, SimpleNamespace(channel=a, **state), SimpleNamespace(channel=b, **state))
+
+
+def flush_later(n: int, delay: float) -> tuple[float, Capture, Capture]:
+    main, structured = Capture(), Capture()
+    app.log.addHandler(main)
+    app.voice_events_log.addHandler(structured)
+    try:
+        coalescer = app.VoiceEventCoalescer(window=3600, threshold=8)  # flush manuel
+
+        async def burst():
+            t = time.time()
+            for events in moves(n):
+                coalescer.add(1, events)
+            await asyncio.sleep(delay)
+            coalescer.flush(1, sync=True)
+            return t
+
+        t_event = asyncio.run(burst())
+    finally:
+        app.log.removeHandler(main)
+        app.voice_events_log.removeHandler(structured)
+    return t_event, main, structured
+
+
+def test_structured_records_carry_event_time():
+    t_event, _, structured = flush_later(20, 0.3)
+    assert len(structured.records) == 20
+    for rec in structured.records:
+        assert abs(rec.created - t_event) < 0.1
+        ts = json.loads(app.JsonLineFormatter().format(rec))["ts"]
+        assert abs(app.datetime.fromisoformat(ts).timestamp() - t_event) < 0.1
+
+
+def test_individual_and_summary_lines_carry_event_time():
+    for n in (3, 20):  # sous le seuil : lignes individuelles ; au-dessus : résumé
+        t_event, main, _ = flush_later(n, 0.3)
+        assert main.records
+        assert all(abs(rec.created - t_event) < 0.1 for rec in main.records)
@@ -0,0 +1,151 @@
+"""Reprise de lecture après coupure vocale simulée (et pas après un kick par un modo)."""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app
+
+GUILD_ID, CHANNEL_ID, BOT_ID = 1, 10, 99
+
+
+class FakeVC:
+    def __init__(self, channel):
+        self.channel = channel
+        self.connected = True
+        self.played: list[tuple[str, float]] = []  # (stream_url, position -ss)
+        self.paused = False
+
+    def is_connected(self):
+        return self.connected
+
+    def play(self, source, after=None):
+        self.played.append(source)
+        self.after = after
+
+    def pause(self):
+        self.paused = True
+
+    async def disconnect(self, force=False):
+        self.connected = False
+
+
+@pytest.fixture
+def voice(monkeypatch):
+    guild = SimpleNamespace(id=GUILD_ID, voice_client=None)
+    channel = SimpleNamespace(id=CHANNEL_ID, guild=guild)
+    monkeypatch.setattr(app.bot, "get_channel", lambda cid: channel if cid == CHANNEL_ID else None)
+    monkeypatch.setattr(app, "build_ffmpeg_source", lambda url, start=0.0: (url, start))
+    monkeypatch.setattr(app.bot._connection, "user", SimpleNamespace(id=BOT_ID))
+    app._playback.clear()
+    yield guild, channel
+    app._playback.clear()
+
+
+def test_simulated_disconnect_resumes_at_position(voice):
+    guild, channel = voice
+    pb = app.Playback(GUILD_ID, CHANNEL_ID, "titre", "https://page", "https://stream", duration=300, offset=42.0)
+    app._playback[GUILD_ID] = pb
+    guild.voice_client = FakeVC(channel)
+    guild.voice_client.connected = False  # coupure
+
+    async def connect(ch):
+        return FakeVC(ch)
+
+    vc = asyncio.run(app.resume_after_disconnect(pb, connect=connect))
+    assert vc is not None
+    url, start = vc.played[0]
+    assert url == "https://stream"
+    assert 42.0 <= start < 43.0
+    assert app._playback[GUILD_ID] is pb
+    assert GUILD_ID not in app._reconnecting
+
+
+def test_moderator_disconnect_forgets_playback(voice):
+    guild, channel = voice
+    app._playback[GUILD_ID] = app.Playback(GUILD_ID, CHANNEL_ID, "t", "p", "s")
+    me = SimpleNamespace(id=BOT_ID, bot=True, guild=guild)
+    before = SimpleNamespace(channel=channel)
+    after = SimpleNamespace(channel=None)
+    asyncio.run(app.on_voice_state_update(me, before, after))
+    assert GUILD_ID not in app._playback
+
+    async def connect(ch):
+        raise AssertionError("ne doit pas se reconnecter après un kick")
+
+    pb = app.Playback(GUILD_ID, CHANNEL_ID, "t", "p", "s")
+    assert asyncio.run(app.resume_after_disconnect(pb, connect=connect)) is None
+
+
+def drop_then_echo(voice, monkeypatch, *, kick: bool) -> list[FakeVC]:
+    """Ordre réel des événements ; renvoie les VoiceClient créés par une reconnexion."""
+    guild, channel = voice
+    me = SimpleNamespace(id=BOT_ID, bot=True, guild=guild)
+    reconnects: list[FakeVC] = []
+
+    async def connect(**kwargs):
+        reconnects.append(FakeVC(channel))
+        return reconnects[-1]
+
+    channel.connect = connect
+
+    async def scenario():
+        monkeypatch.setattr(app.bot, "loop", asyncio.get_running_loop())
+        vc = guild.voice_client = FakeVC(channel)
+        app.start_playback(vc, app.Playback(GUILD_ID, CHANNEL_ID, "t", "p", "s", duration=300, offset=42.0))
+        echo = app.on_voice_state_update(me, SimpleNamespace(channel=channel), SimpleNamespace(channel=None))
+        if kick:
+            await echo  # le kick arrive par la gateway, avant que discord.py n'arrête le player
+        vc.connected = False
+        await asyncio.to_thread(vc.after, None)  # thread du player
+        if not kick:
+            await echo  # 1006/4015 : disconnect() de discord.py, puis écho de son propre départ
+        await asyncio.sleep(0.8)  # _on_track_end attend 0.5 s
+
+    asyncio.run(scenario())
+    return reconnects
+
+
+def test_network_drop_echo_does_not_cancel_resume(voice, monkeypatch):
+    reconnects = drop_then_echo(voice, monkeypatch, kick=False)
+    assert len(reconnects) == 1
+    url, start = reconnects[0].played[0]
+    assert url == "s" and 42.0 <= start < 44.0
+    assert GUILD_ID not in app._reconnecting
+
+
+def test_kick_then_player_stop_does_not_resume(voice, monkeypatch):
+    assert drop_then_echo(voice, monkeypatch, kick=True) == []
+    assert GUILD_ID not in app._playback
+    assert GUILD_ID not in app._reconnecting
+
+
+def test_snapshot_restore_keeps_position(voice, monkeypatch):
+    guild, channel = voice
+    data = app.Playback(GUILD_ID, CHANNEL_ID, "t", "p", "s", duration=300).to_dict()
+    data["position"] = 42.0
+    data["extracted_at"] = time.time() - app.STREAM_URL_TTL - 1  # URL expirée → ré-extraction
+
+    connected: list[FakeVC] = []
+
+    async def connect(**kwargs):
+        await asyncio.sleep(0.2)  # connexion lente
+        connected.append(FakeVC(channel))
+        return connected[-1]
+
+    def slow_extract(url):
+        time.sleep(0.3)  # yt-dlp : ne doit pas faire avancer la piste restaurée
+        return {"url": "s2"}
+
+    channel.connect = connect
+    monkeypatch.setattr(app, "yt_dlp", object())
+    monkeypatch.setattr(app, "extract_track", slow_extract)
+
+    async def restore():
+        await app._restore_voice({"channel_id": CHANNEL_ID, "playback": data})
+        return app._playback[GUILD_ID].elapsed()
+
+    elapsed = asyncio.run(restore())
+    assert connected[0].played == [("s2", 42.0)]  # ffmpeg -ss exactement à la position du snapshot
+    assert 42.0 <= elapsed < 42.1                # horloge de la piste restaurée, après connexion + yt-dlp